@@ -0,0 +1,141 @@
+import os
+import math
+import time
+import threading
+from contextlib import contextmanager
+from cache import LRUCache
+from gemini_client import TokenBucket
+from metrics import ADMISSION
+
+# Requests per minute allowed from one client by each worker process; 0 disables the limit
+ADMISSION_CLIENT_RPM = int(os.getenv("ADMISSION_CLIENT_RPM", "30"))
+# Identify clients by the first X-Forwarded-For address; only safe behind a trusted proxy
+ADMISSION_TRUST_PROXY = os.getenv("ADMISSION_TRUST_PROXY", "0") == "1"
+# Concurrent generations and queued requests per worker process, per lane
+ADMISSION_SHORT_SLOTS = int(os.getenv("ADMISSION_SHORT_SLOTS", "16"))
+ADMISSION_SHORT_QUEUE = int(os.getenv("ADMISSION_SHORT_QUEUE", "64"))
+ADMISSION_LONG_SLOTS = int(os.getenv("ADMISSION_LONG_SLOTS", "4"))
+ADMISSION_LONG_QUEUE = int(os.getenv("ADMISSION_LONG_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+
+# Styles with the longest outputs get their own lane so they cannot starve quick summaries
+LONG_STYLES = ("teacher", "article")
+
+# Weight of the latest generation time in the moving average behind Retry-After
+EWMA_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    """The request was not admitted; retry_after is a whole number of seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"{reason}; retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    A fixed number of concurrent slots with a bounded queue in front. Arrivals that find
+    the queue full are rejected at once, with a wait estimated from the queue depth and a
+    moving average of how long each admitted request has been taking.
+    """
+
+    def __init__(self, name, slots, queue_size, estimate=10.0):
+        self.name = name
+        self.slots = max(slots, 1)
+        self.queue_size = queue_size
+        self.average_seconds = estimate
+        self.running = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def retry_after(self):
+        """Seconds until everything queued now should have been served."""
+        rounds = (self.waiting + 1) / self.slots
+        return max(1, math.ceil(rounds * self.average_seconds))
+
+    def full(self):
+        return self.running >= self.slots
+
+    def check(self):
+        """Raise Overloaded if a new arrival would be turned away."""
+        with self._condition:
+            if self.full() and self.waiting >= self.queue_size:
+                raise Overloaded("queue_full", self.retry_after())
+
+    def enter(self, timeout=ADMISSION_QUEUE_TIMEOUT):
+        with self._condition:
+            if self.full() and self.waiting >= self.queue_size:
+                raise Overloaded("queue_full", self.retry_after())
+            self.waiting += 1
+            ADMISSION.labels(lane=self.name, state="waiting").inc()
+            try:
+                deadline = time.monotonic() + timeout
+                while self.full():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Overloaded("queue_timeout", self.retry_after())
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+                ADMISSION.labels(lane=self.name, state="waiting").dec()
+            self.running += 1
+            ADMISSION.labels(lane=self.name, state="running").inc()
+
+    def leave(self, seconds):
+        with self._condition:
+            self.running -= 1
+            ADMISSION.labels(lane=self.name, state="running").dec()
+            self.average_seconds += EWMA_ALPHA * (seconds - self.average_seconds)
+            self._condition.notify()
+
+
+class AdmissionController:
+    """
+    Decides whether a request is accepted: each client draws from its own requests-per-minute
+    bucket, and summary generations run in a short or long lane depending on the style.
+    Client buckets are kept in process; a SQLite transaction on every request would make
+    all of a gevent worker's requests wait on each other's busy waits.
+    """
+
+    def __init__(self, client_rpm=ADMISSION_CLIENT_RPM):
+        self.client_rpm = client_rpm
+        self.lanes = {
+            "short": Lane("short", ADMISSION_SHORT_SLOTS, ADMISSION_SHORT_QUEUE),
+            "long": Lane("long", ADMISSION_LONG_SLOTS, ADMISSION_LONG_QUEUE, estimate=30.0),
+        }
+        self._buckets = LRUCache(maxsize=10000, ttl=600)
+
+    def lane(self, style):
+        return self.lanes["long" if style in LONG_STYLES else "short"]
+
+    def _bucket(self, client):
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(f"client:{client}", self.client_rpm)
+            self._buckets.set(client, bucket)
+        return bucket
+
+    def check_client(self, client, cost=1):
+        """Charge cost requests to client, raising Overloaded if it is over its limit."""
+        if not self.client_rpm:
+            return
+        wait = self._bucket(client).try_acquire(cost)
+        if wait:
+            raise Overloaded("rate_limited", max(1, math.ceil(wait)))
+
+    def check(self, style):
+        """Fail fast if the lane for style has no room, without taking a slot."""
+        self.lane(style).check()
+
+    @contextmanager
+    def slot(self, style):
+        """Hold a slot in the lane for style, queueing for one if needed."""
+        lane = self.lane(style)
+        lane.enter()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            lane.leave(time.monotonic() - start)
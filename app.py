@@ -1,24 +1,79 @@
 import os
 import re
 import requests
+import sqlite3
 import json
+import math
+import time
+import threading
 import traceback
-from flask import Flask, render_template, request, jsonify
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, VideoUnavailable, NoTranscriptFound
-import google.generativeai as genai
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+from youtube_transcript_api import VideoUnavailable
 from dotenv import load_dotenv
+from cache import TieredCache
+from transcripts import TranscriptStore
+from mapreduce import MAP_CHUNK_TOKENS, needs_map_reduce, condense_transcript, condense_range, format_timestamp
+from metadata import MetadataFetcher, MetadataUnavailable, parse_timestamp
+from preprocess import preprocess_transcript
+from prompts import normalize, prompt_version, render_prompt, template_for
+from segments import SegmentStore
+from tokens import estimate_tokens
+import metrics
+from jobs import FlightTimeout, JobManager, SingleFlight
+from gemini_client import GeminiClient, GeminiRateLimited, GeminiUnavailable
+from admission import ADMISSION_TRUST_PROXY, AdmissionController, Overloaded
+from archive import SummaryArchive
+from startup import STARTUP_WARMUP, warmup
+from http_cache import canonical_json, choose_encoding, encode, not_modified, strong_etag, variant_etag
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+app = Flask(__name__)
 
-# Initialize the model
-model = genai.GenerativeModel('gemini-1.5-pro')
+# Summary cache: per-worker LRU in front of a SQLite table shared by all workers
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "512"))
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+SUMMARY_CACHE_FALLBACK_TTL = int(os.getenv("SUMMARY_CACHE_FALLBACK_TTL", "3600"))
+summary_cache = TieredCache("summaries", maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL)
+# How long browsers, proxies and CDNs may reuse a GET /v1/summary response; metadata-only
+# summaries use SUMMARY_CACHE_FALLBACK_TTL, since a transcript may turn up later
+SUMMARY_HTTP_MAX_AGE = int(os.getenv("SUMMARY_HTTP_MAX_AGE", "86400"))
 
-app = Flask(__name__)
+# Caption catalogs and timed segments, including negative results for captionless videos
+transcript_store = TranscriptStore()
+
+# Shared Gemini client: model reuse, rate limiting, retries and circuit breaker
+gemini = GeminiClient()
+
+# Pooled, cached watch-page metadata fetcher
+metadata_fetcher = MetadataFetcher()
+METADATA_WAIT = float(os.getenv("METADATA_WAIT", "2"))
+
+# Identical summaries requested at the same time share one pipeline run; a request that
+# joins a run gives up on it after SUMMARY_WAIT_TIMEOUT seconds
+SUMMARY_WAIT_TIMEOUT = float(os.getenv("SUMMARY_WAIT_TIMEOUT", "300"))
+summary_flight = SingleFlight(timeout=SUMMARY_WAIT_TIMEOUT)
+job_manager = JobManager()
+
+# Batch summarization limits
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# Most (language, style) outputs one /summarize/multi request may ask for
+MULTI_MAX_TARGETS = int(os.getenv("MULTI_MAX_TARGETS", "6"))
+
+# Per-client rate limits and short/long lanes for summary generation
+admission = AdmissionController()
+
+# Every generated summary, kept for /summaries/<video_id> and /search
+summary_archive = SummaryArchive()
+
+# Client libraries load on first use; each worker warms them up in the background as it
+# starts (see gunicorn.conf.py) and /healthz reports ready once that has finished
+if STARTUP_WARMUP:
+    warmup.add('gemini', gemini.model)
 
 # Error codes and messages
 ERROR_CODES = {
@@ -28,73 +83,29 @@ ERROR_CODES = {
     "GEMINI_API_ERROR": {"code": "E004", "message": "Error connecting to Gemini API. Please check your API key or try again later."},
     "NETWORK_ERROR": {"code": "E005", "message": "Network error occurred. Please check your internet connection and try again."},
     "METADATA_EXTRACTION_ERROR": {"code": "E006", "message": "Could not extract video metadata. The video might be unavailable or restricted."},
+    "JOB_NOT_FOUND": {"code": "E007", "message": "This job does not exist or has expired. Please submit the video again."},
+    "INVALID_BATCH": {"code": "E008", "message": "The batch must contain at least one YouTube URL and no more than the allowed maximum."},
+    "RATE_LIMITED": {"code": "E009", "message": "Too many requests. Please wait a moment and try again."},
+    "SERVER_BUSY": {"code": "E010", "message": "The server is busy right now. Please try again in a moment."},
+    "INVALID_RANGE": {"code": "E011", "message": "The requested time range or chapter does not exist in this video."},
+    "INVALID_TARGETS": {"code": "E012", "message": "Ask for at least one and no more than the allowed number of language and style combinations."},
+    "NOT_ARCHIVED": {"code": "E013", "message": "No summary of this video has been archived yet. Summarize it first."},
+    "INVALID_QUERY": {"code": "E014", "message": "Enter one or more words to search for."},
     "GENERAL_ERROR": {"code": "E999", "message": "An unexpected error occurred. Please try again later."}
 }
 
+# A bare YouTube video ID
+VIDEO_ID_PATTERN = re.compile(r'[a-zA-Z0-9_-]{11}')
+# Every supported URL form in one pass: youtu.be/ID, youtube.com/watch?v=ID (v may follow
+# other parameters), /v/ID, /embed/ID, /shorts/ID, on any subdomain such as m. or www.
+VIDEO_URL_PATTERN = re.compile(
+    r'(?:youtu\.be/|youtube\.com/(?:v/|embed/|shorts/)|[?&]v=)([a-zA-Z0-9_-]{11})(?![a-zA-Z0-9_-])'
+)
+
 def extract_video_id(youtube_url):
-    """Extract the video ID from a YouTube URL."""
-    # تنظيف الرابط من أي مسافات
-    youtube_url = youtube_url.strip()
-    
-    # أنماط مختلفة من روابط YouTube
-    patterns = [
-        # youtu.be/VIDEO_ID
-        r'youtu\.be\/([a-zA-Z0-9_-]{11})',
-        # youtube.com/watch?v=VIDEO_ID
-        r'youtube\.com\/watch\?v=([a-zA-Z0-9_-]{11})',
-        # youtube.com/v/VIDEO_ID
-        r'youtube\.com\/v\/([a-zA-Z0-9_-]{11})',
-        # youtube.com/embed/VIDEO_ID
-        r'youtube\.com\/embed\/([a-zA-Z0-9_-]{11})',
-        # m.youtube.com/watch?v=VIDEO_ID
-        r'm\.youtube\.com\/watch\?v=([a-zA-Z0-9_-]{11})',
-        # youtube.com/shorts/VIDEO_ID
-        r'youtube\.com\/shorts\/([a-zA-Z0-9_-]{11})'
-    ]
-    
-    # البحث عن معرف الفيديو باستخدام الأنماط المختلفة
-    for pattern in patterns:
-        match = re.search(pattern, youtube_url)
-        if match:
-            return match.group(1)
-    
-    # إذا كان الرابط يحتوي على v= ولكن لم يتم العثور عليه بالأنماط السابقة
-    if "v=" in youtube_url:
-        try:
-            # استخراج معرف الفيديو من الرابط بعد v=
-            video_id = youtube_url.split("v=")[1]
-            # إزالة أي معلمات إضافية بعد معرف الفيديو
-            if "&" in video_id:
-                video_id = video_id.split("&")[0]
-            # التحقق من أن معرف الفيديو صالح (11 حرفًا)
-            if len(video_id) == 11:
-                return video_id
-        except:
-            pass
-    
-    # إذا كان الرابط يحتوي على /v/ ولكن لم يتم العثور عليه بالأنماط السابقة
-    if "/v/" in youtube_url:
-        try:
-            video_id = youtube_url.split("/v/")[1]
-            if "?" in video_id:
-                video_id = video_id.split("?")[0]
-            if len(video_id) == 11:
-                return video_id
-        except:
-            pass
-    
-    # إذا كان الرابط يحتوي على youtu.be/ ولكن لم يتم العثور عليه بالأنماط السابقة
-    if "youtu.be/" in youtube_url:
-        try:
-            video_id = youtube_url.split("youtu.be/")[1]
-            if "?" in video_id:
-                video_id = video_id.split("?")[0]
-            if len(video_id) == 11:
-                return video_id
-        except:
-            pass
-    
-    return None
+    """Extract the video ID from a YouTube URL, or None if there is none."""
+    match = VIDEO_URL_PATTERN.search(youtube_url)
+    return match.group(1) if match else None
 
 def extract_video_title(youtube_url):
     """Attempt to extract the video title from a YouTube URL."""
@@ -104,242 +115,386 @@ def extract_video_title(youtube_url):
         return title_match.group(1).replace('+', ' ')
     return None
 
-def get_youtube_transcript(video_id, language=None):
+def fetch_transcript(video_id, language=None):
     """
-    Get transcript for a YouTube video. Attempt to get transcript in the specified language,
-    if not available, attempt to get it in any available language.
+    Get the best available transcript for a YouTube video from the transcript store.
+    Prefers the specified language and falls back to any available language.
+    Returns the store entry (language_code, is_generated, segments) or None, and raises
+    VideoUnavailable for videos that cannot be watched.
     """
     try:
-        # First try to get transcript in the specified language
-        if language:
-            try:
-                transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=[language, language[:2]])
-                return ' '.join([t['text'] for t in transcript_list])
-            except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable) as e:
-                print(f"Could not get transcript in language {language}: {str(e)}")
-                # Continue to try other languages
-        
-        # If no specific language or specific language failed, try to get any transcript
-        try:
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            
-            # Try to get manually created transcript first (usually higher quality)
-            for transcript in transcript_list:
-                if not transcript.is_generated:
-                    full_transcript = transcript.fetch()
-                    print(f"Found manually created transcript in {transcript.language_code}")
-                    return ' '.join([t['text'] for t in full_transcript])
-            
-            # If no manual transcript, get any available transcript
-            generated_transcript = next(iter(transcript_list)).fetch()
-            source_lang = next(iter(transcript_list)).language_code
-            print(f"Using generated transcript in {source_lang}")
-            return ' '.join([t['text'] for t in generated_transcript])
-            
-        except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable) as e:
-            print(f"Could not get transcript in any language: {str(e)}")
-            return None
-            
+        with metrics.track('transcript'):
+            return transcript_store.get(video_id, language)
+    except VideoUnavailable:
+        raise
     except Exception as e:
         print(f"An error occurred while getting transcript: {str(e)}")
         return None
 
+def build_prompt(text, language="en", is_transcript=True, video_id=None, style="standard"):
+    """Build the Gemini prompt for the given content, language and summary style."""
+    prompt, _ = render_prompt(text, language, is_transcript, video_id, style)
+    return prompt
+
+def gemini_error_message(e):
+    """Turn a Gemini exception into the user-facing "Error: ..." message."""
+    from google.api_core import exceptions as google_exceptions
+    from google.generativeai.types import BlockedPromptException, StopCandidateException
+    if isinstance(e, GeminiUnavailable):
+        return "Error: Gemini API is temporarily unavailable after repeated failures. Please try again in a minute."
+    elif isinstance(e, (GeminiRateLimited, google_exceptions.ResourceExhausted)):
+        return "Error: Gemini API quota exceeded. Please try again later or check your API key limits."
+    elif isinstance(e, (google_exceptions.Unauthenticated, google_exceptions.PermissionDenied)):
+        return "Error: Invalid or missing Gemini API key. Please check your API key configuration."
+    elif isinstance(e, (BlockedPromptException, StopCandidateException)):
+        return "Error: The content was blocked by Gemini API safety settings. The video may contain sensitive or restricted content."
+    else:
+        return f"Error generating summary: {str(e)}"
+
+def generate_with_gemini(prompt):
+    """Send a prompt to Gemini and return the generated text. Errors are raised."""
+    return gemini.generate(prompt)
+
 def summarize_with_gemini(text, language="en", is_transcript=True, video_id=None, style="standard"):
     try:
-        model = genai.GenerativeModel(model_name="gemini-1.5-pro")
-        
-        # Handle case when no text is available
-        if not text and video_id:
-            # If no text is available, use the video ID to create a minimal prompt
-            if language == "ar":
-                prompt = f"""
-                لم يتم العثور على نص للفيديو ذو المعرف {video_id}.
-                
-                الرجاء تقديم وصف عام يشرح:
-                1. أن المحتوى لا يمكن تلخيصه بدون نص
-                2. الأسباب المحتملة لعدم توفر النص (مثل: الفيديو لا يحتوي على ترجمة، أو أن الترجمة غير متاحة، أو أن الفيديو خاص)
-                3. نصائح للمستخدم حول كيفية العثور على ملخصات أو معلومات بديلة
-                """
-            else:
-                prompt = f"""
-                No transcript could be found for the video with ID {video_id}.
-                
-                Please provide a general description explaining:
-                1. That the content cannot be summarized without a transcript
-                2. Possible reasons why the transcript is not available (e.g., video doesn't have captions, captions are disabled, or the video is private)
-                3. Tips for the user on how to find alternative summaries or information
-                """
-        elif language == "ar":
-            if is_transcript:
-                if style == "teacher":
-                    prompt = f"""
-                    أنت معلم محترف ومتخصص. قم بشرح نص هذا الفيديو بالتفصيل الكامل كما لو كنت تشرحه لطلابك باللغة العربية، دون اختصار أي محتوى.
-                    
-                    نص الفيديو (قد يكون بلغة أخرى، قم بترجمته وشرحه بالعربية):
-                    {text}
-                    
-                    يجب أن يتضمن الشرح:
-                    1. مقدمة تعريفية شاملة بالموضوع وأهميته
-                    2. شرح تفصيلي للأفكار الرئيسية بأسلوب تعليمي واضح
-                    3. توضيح المفاهيم المعقدة والمصطلحات التقنية مع أمثلة متعددة سهلة الفهم
-                    4. تقسيم المعلومات إلى أقسام منطقية وتسلسلية
-                    5. شرح كل نقطة بالتفصيل مع ربطها بالواقع العملي والتطبيقات
-                    6. خلاصة تلخص النقاط الأساسية وتربط الموضوع بالواقع العملي
-                    
-                    استخدم أسلوباً تعليمياً يناسب شرح المعلم للطلاب، مع الحفاظ على المستوى العلمي للمحتوى.
-                    هام: لا تقم باختصار المحتوى، بل قدّم شرحاً تفصيلياً كاملاً لكل محتوى الفيديو.
-                    """
-                elif style == "article":
-                    prompt = f"""
-                    أنت كاتب محترف ومتخصص في مجال المحتوى المعروض. قم بتحويل نص هذا الفيديو إلى مقالة احترافية تفصيلية باللغة العربية دون اختصار أي محتوى.
-                    
-                    نص الفيديو (قد يكون بلغة أخرى، قم بترجمته وكتابته كمقالة كاملة بالعربية):
-                    {text}
-                    
-                    يجب أن تتضمن المقالة:
-                    1. عنواناً جذاباً وفقرة افتتاحية قوية تمهد للموضوع
-                    2. تطوير كامل وشامل للأفكار بأسلوب أدبي رصين
-                    3. استخدام لغة احترافية تناسب المتخصصين في المجال
-                    4. شرح تفصيلي لكل نقطة مع أمثلة توضيحية
-                    5. تنظيم المحتوى في فقرات متماسكة وعناوين فرعية واضحة
-                    6. تحليل عميق للمفاهيم والأفكار المطروحة
-                    7. خاتمة تستخلص الأفكار الرئيسية وتقدم رؤية مستقبلية أو توصيات
-                    
-                    اكتب المقالة كخبير متخصص في المجال، مع إظهار عمق المعرفة والخبرة المهنية.
-                    هام: قدم تفاصيل كاملة دون اختصار، واشرح كل محتوى الفيديو بشكل شامل.
-                    """
-                else:  # standard/summary style
-                    prompt = f"""
-                    أنت مساعد محترف لتلخيص مقاطع الفيديو. قم بتلخيص نص هذا الفيديو بطريقة شاملة ومختصرة باللغة العربية.
-                    
-                    نص الفيديو (قد يكون بلغة أخرى، قم بترجمته وتلخيصه بالعربية):
-                    {text}
-                    
-                    قدم ملخصًا مختصراً يغطي النقاط الرئيسية والمعلومات المهمة.
-                    
-                    يجب أن يتضمن الملخص:
-                    1. الأفكار والمفاهيم الرئيسية، مع التركيز على النقاط الأساسية
-                    2. شرح مختصر للمصطلحات التقنية أو المعقدة إذا وجدت
-                    3. تقسيم المعلومات إلى أقسام واضحة لسهولة القراءة
-                    4. تغطية مختصرة للمحتوى دون إطالة غير ضرورية
-                    
-                    قدم الملخص بتنسيق سهل القراءة، باستخدام النقاط والعناوين الفرعية عند الحاجة.
-                    """
-            else:
-                # For metadata, we'll keep the style simpler regardless of selected style
-                prompt = f"""
-                أنت مساعد محترف لتلخيص مقاطع الفيديو. استنادًا إلى المعلومات المتاحة عن هذا الفيديو، قم بإنشاء ملخص مفيد باللغة العربية.
-                
-                معلومات الفيديو (قد تكون بلغة أخرى، قم بترجمتها وتلخيصها بالعربية):
-                {text}
-                
-                حاول تقديم معلومات دقيقة وشاملة، مع العلم أن المعلومات المتاحة محدودة.
-                
-                ضمّن في ملخصك:
-                1. الأفكار الرئيسية والمفاهيم المهمة بناءً على المعلومات المتاحة
-                2. تحليل لما يبدو أن الفيديو يدور حوله
-                3. تقسيم المعلومات إلى أقسام واضحة إن أمكن
-                
-                قدم الملخص بتنسيق سهل القراءة.
-                ملاحظة: هذا الملخص يعتمد على معلومات محدودة وليس على المحتوى الكامل للفيديو.
-                """
-        else:  # English
-            if is_transcript:
-                if style == "teacher":
-                    prompt = f"""
-                    You are a professional educator and subject matter expert. Explain this video transcript in FULL DETAIL as if you were teaching it to your students in English, without summarizing or omitting any content.
-                    
-                    Video transcript (may be in another language, please translate to English and explain thoroughly):
-                    {text}
-                    
-                    Your explanation should include:
-                    1. A comprehensive introduction that frames the topic and its importance
-                    2. Detailed explanations of ALL ideas using educational techniques
-                    3. Thorough clarification of complex concepts and technical terms with multiple easy-to-understand examples
-                    4. Organization of information into logical, sequential sections
-                    5. In-depth explanation of each point with practical applications
-                    6. A conclusion that connects the topic to practical applications
-                    
-                    Use a teaching style appropriate for a classroom setting while maintaining the academic integrity of the content.
-                    IMPORTANT: Do NOT summarize the content. Provide a COMPLETE and DETAILED explanation of all video content.
-                    """
-                elif style == "article":
-                    prompt = f"""
-                    You are a professional writer and subject matter expert in the presented content area. Transform this video transcript into a comprehensive professional article in English, without summarizing or omitting any content.
-                    
-                    Video transcript (may be in another language, please translate to English and write as a full article):
-                    {text}
-                    
-                    The article should include:
-                    1. A compelling headline and strong opening paragraph that introduces the topic
-                    2. Full development of ALL ideas in a polished, literary style
-                    3. Professional language appropriate for specialists in the field
-                    4. Detailed explanation of each point with illustrative examples
-                    5. Content organized into cohesive paragraphs with clear subheadings
-                    6. In-depth analysis of concepts and ideas presented
-                    7. A conclusion that draws out key insights and offers forward-looking perspectives or recommendations
-                    
-                    Write the article as a domain expert, demonstrating depth of knowledge and professional expertise.
-                    IMPORTANT: Provide COMPLETE details without summarizing, and fully explain all video content.
-                    """
-                else:  # standard/summary style
-                    prompt = f"""
-                    You are a professional video summarizer. Summarize this video transcript in a clear, concise manner in English.
-                    
-                    Video transcript (may be in another language, please translate to English and summarize):
-                    {text}
-                    
-                    Provide a concise summary that covers the key points and important information.
-                    
-                    Your summary should include:
-                    1. The main ideas and key concepts, with emphasis on the essential points
-                    2. Brief explanations of technical or complex terms if present
-                    3. Information broken down into clear sections for readability
-                    4. Concise coverage of content without unnecessary verbosity
-                    
-                    Present the summary in an easy-to-read format, using bullet points and subheadings when needed.
-                    """
-            else:
-                # For metadata, we'll keep the style simpler regardless of selected style
-                prompt = f"""
-                You are a professional video summarizer. Based on the available information about this video, create a helpful summary in English.
-                
-                Video information (may be in another language, please translate to English and summarize):
-                {text}
-                
-                Try to provide accurate and comprehensive information, keeping in mind that the available information is limited.
-                
-                Include in your summary:
-                1. The main ideas and important concepts based on the available information
-                2. An analysis of what the video appears to be about
-                3. Breakdown of information into clear sections if possible
-                
-                Present the summary in an easy-to-read format.
-                NOTE: This summary is based on limited information and not the full video content.
-                """
-        
-        response = model.generate_content(prompt)
-        return response.text
+        prompt = build_prompt(text, language, is_transcript, video_id, style)
+        return generate_with_gemini(prompt)
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"Error with Gemini API: {str(e)}\n{error_details}")
         
         # Create a user-friendly error message
-        if "quota" in str(e).lower():
-            return "Error: Gemini API quota exceeded. Please try again later or check your API key limits."
-        elif "key" in str(e).lower():
-            return "Error: Invalid or missing Gemini API key. Please check your API key configuration."
-        elif "content" in str(e).lower() and "blocked" in str(e).lower():
-            return "Error: The content was blocked by Gemini API safety settings. The video may contain sensitive or restricted content."
-        else:
-            return f"Error generating summary: {str(e)}"
+        return gemini_error_message(e)
+
+def stream_with_gemini(text, language="en", is_transcript=True, video_id=None, style="standard"):
+    """
+    Generate a summary with Gemini's streaming API, returning an iterator of text chunks.
+    Errors are raised to the caller, which decides how to report them mid-stream.
+    """
+    prompt = build_prompt(text, language, is_transcript, video_id, style)
+    return gemini.stream(prompt)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """Record HTTP latency, and count error codes of JSON error responses."""
+    if request.endpoint and request.endpoint != 'prometheus_metrics' and 'request_started' in g:
+        metrics.HTTP_LATENCY.labels(endpoint=request.endpoint, status=response.status_code).observe(time.perf_counter() - g.request_started)
+    if response.status_code >= 400 and response.is_json:
+        metrics.record_error(response.get_json(silent=True))
+    return response
+
+def client_id():
+    """Address a request is rate limited by."""
+    if ADMISSION_TRUST_PROXY and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or 'unknown'
+
+def overloaded_payload(e):
+    """Error payload for a request turned away by admission control."""
+    key = "RATE_LIMITED" if e.reason == 'rate_limited' else "SERVER_BUSY"
+    return {
+        'error': ERROR_CODES[key]["message"],
+        'error_code': ERROR_CODES[key]["code"],
+        'error_type': key.lower(),
+        'retry_after': e.retry_after
+    }
+
+@app.errorhandler(Overloaded)
+def handle_overloaded(e):
+    return jsonify(overloaded_payload(e)), 429
+
+@app.after_request
+def add_retry_after(response):
+    """Tell clients turned away with 429 when to come back."""
+    if response.status_code == 429 and response.is_json and 'Retry-After' not in response.headers:
+        retry_after = (response.get_json(silent=True) or {}).get('retry_after')
+        if retry_after:
+            response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.route('/healthz')
+def healthz():
+    """Readiness: 200 once this worker's clients are warm, 503 while it is still starting."""
+    warmup.start()
+    status = warmup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus metrics, aggregated across all gunicorn workers."""
+    body, content_type = metrics.exposition()
+    return Response(body, content_type=content_type)
+
+def metadata_fields(metadata):
+    """Video metadata included in summary responses."""
+    return {
+        'title': metadata['title'],
+        'author': metadata['author'],
+        'duration': metadata['duration'],
+        'chapters': metadata['chapters']
+    }
+
+def optional_metadata_fields(metadata_future):
+    """Metadata fields if the background fetch finishes in time; the summary never waits long for them."""
+    try:
+        return metadata_fields(metadata_future.result(timeout=METADATA_WAIT))
+    except Exception as e:
+        print(f"Metadata not available: {str(e)}")
+        return {}
+
+def transcript_source(language_code, language):
+    """'direct' when the transcript is already in the requested language, else 'translated'."""
+    return 'direct' if language_code[:2] == language[:2] else 'translated'
+
+def resolve_content(video_id, language="en"):
+    """
+    Decide what to summarize for a video: its transcript when available, otherwise its
+    title and description, otherwise only its ID.
+    Returns (content, None) or (None, (error_payload, http_status)). content holds the
+    'text' and 'is_transcript' to pass to Gemini and the 'fields' to add to the response.
+    """
+    # Metadata is cheap and cached, so fetch it alongside the transcript for every request
+    metadata_future = metadata_fetcher.prefetch(video_id)
+    
+    # Try to get the transcript
+    try:
+        entry = fetch_transcript(video_id, language)
+        transcript = None
+        if entry:
+            # Strip caption noise before it costs Gemini tokens
+            with metrics.track('preprocess'):
+                cleaned, preprocessing = preprocess_transcript(entry['segments'])
+                segments = SegmentStore.from_segments(cleaned)
+            metrics.TOKENS_SAVED.inc(max(preprocessing['tokens_saved'], 0))
+            transcript = segments.text()
+            print(f"Preprocessing saved {preprocessing['chars_in'] - preprocessing['chars_out']} characters (~{preprocessing['tokens_saved']} tokens) for {video_id}")
+        
+        if transcript:
+            # We have a transcript, summarize it
+            return {
+                'text': transcript,
+                'is_transcript': True,
+                'segments': segments,
+                'language_code': entry['language_code'],
+                'fields': dict(optional_metadata_fields(metadata_future), **{
+                    'is_transcript': True,
+                    'has_minimal_info': False,
+                    'transcript_source': transcript_source(entry['language_code'], language),
+                    'preprocessing': preprocessing
+                })
+            }, None
+    except VideoUnavailable:
+        return None, ({
+            'error': ERROR_CODES["VIDEO_UNAVAILABLE"]["message"],
+            'error_code': ERROR_CODES["VIDEO_UNAVAILABLE"]["code"],
+            'error_type': 'video_unavailable'
+        }, 400)
+    except Exception as e:
+        print(f"Transcript error: {str(e)}")
+        # Continue to metadata extraction
+    
+    # No direct transcript available, try to get video metadata
+    try:
+        metadata = metadata_future.result()
+        
+        # Build metadata text
+        metadata_text = f"Video Title: {metadata['title']}\n\nVideo Description: {metadata['description']}"
+        
+        # Use metadata for summarization if we have enough information
+        if len(metadata_text) > 100:  # At least some meaningful content
+            if metadata['author']:
+                metadata_text += f"\n\nChannel: {metadata['author']}"
+            if metadata['duration']:
+                metadata_text += f"\n\nDuration: {format_timestamp(metadata['duration'])}"
+            return {
+                'text': metadata_text,
+                'is_transcript': False,
+                'fields': dict(metadata_fields(metadata), **{
+                    'is_transcript': False,
+                    'has_minimal_info': False,
+                    'warning': ERROR_CODES["NO_TRANSCRIPT"]["message"],
+                    'warning_code': ERROR_CODES["NO_TRANSCRIPT"]["code"]
+                })
+            }, None
+        else:
+            # If we don't have enough metadata, generate a minimal info message
+            return {
+                'text': None,
+                'is_transcript': False,
+                'fields': dict(metadata_fields(metadata), **{
+                    'is_transcript': False,
+                    'has_minimal_info': True,
+                    'warning': ERROR_CODES["NO_TRANSCRIPT"]["message"],
+                    'warning_code': ERROR_CODES["NO_TRANSCRIPT"]["code"]
+                })
+            }, None
+    
+    except MetadataUnavailable as e:
+        print(f"Video unavailable: {str(e)}")
+        return None, ({
+            'error': ERROR_CODES["VIDEO_UNAVAILABLE"]["message"],
+            'error_code': ERROR_CODES["VIDEO_UNAVAILABLE"]["code"],
+            'error_type': 'video_unavailable'
+        }, 400)
+    except requests.exceptions.RequestException as e:
+        print(f"Network error: {str(e)}")
+        return None, ({
+            'error': ERROR_CODES["NETWORK_ERROR"]["message"],
+            'error_code': ERROR_CODES["NETWORK_ERROR"]["code"],
+            'error_type': 'network_error'
+        }, 500)
+    except Exception as e:
+        print(f"Error gathering video info: {str(e)}")
+        traceback.print_exc()
+        
+        # If all else fails, generate a minimal info message
+        return {
+            'text': None,
+            'is_transcript': False,
+            'fields': {
+                'is_transcript': False,
+                'has_minimal_info': True,
+                'warning': ERROR_CODES["METADATA_EXTRACTION_ERROR"]["message"],
+                'warning_code': ERROR_CODES["METADATA_EXTRACTION_ERROR"]["code"]
+            }
+        }, None
+
+def prepare_text(video_id, content):
+    """
+    Return the text to put in the summary prompt. Long transcripts are condensed
+    chunk by chunk first (map step) so the final prompt (reduce step) stays small.
+    """
+    text = content['text']
+    if content['is_transcript'] and needs_map_reduce(text):
+        with metrics.track('map_reduce'):
+            text, chunks = condense_transcript(generate_with_gemini, video_id, content['segments'])
+        content['fields']['map_reduce_chunks'] = chunks
+        print(f"Condensed long transcript of {video_id} from {len(content['text'])} to {len(text)} characters in {chunks} chunks")
+    return text
+
+def generate_summary(video_id, language="en", style="standard"):
+    """
+    Run the transcript -> metadata -> Gemini pipeline for a video.
+    Returns a (payload, http_status) tuple so callers can wrap the result.
+    """
+    content, error = resolve_content(video_id, language)
+    if error:
+        return error
+    
+    try:
+        text = prepare_text(video_id, content)
+    except Exception as e:
+        print(f"Error with Gemini API: {str(e)}\n{traceback.format_exc()}")
+        return {
+            'error': gemini_error_message(e),
+            'error_code': ERROR_CODES["GEMINI_API_ERROR"]["code"],
+            'error_type': 'gemini_api_error'
+        }, 500
+    
+    return complete_summary(content['fields'], text, language, content['is_transcript'], video_id, style)
+
+def complete_summary(fields, text, language, is_transcript, video_id, style):
+    """Reduce step: generate the summary of text and return (payload, http_status)."""
+    try:
+        summary = summarize_with_gemini(text, language, is_transcript=is_transcript, video_id=video_id, style=style)
+    except Exception as e:
+        print(f"Final error: {str(e)}")
+        return {
+            'error': ERROR_CODES["GENERAL_ERROR"]["message"],
+            'error_code': ERROR_CODES["GENERAL_ERROR"]["code"],
+            'error_type': 'general_error'
+        }, 500
+    
+    # Check if the summary contains error message
+    if summary.startswith("Error:"):
+        return {
+            'error': summary,
+            'error_code': ERROR_CODES["GEMINI_API_ERROR"]["code"],
+            'error_type': 'gemini_api_error'
+        }, 500
+    
+    template = template_for(text, language, is_transcript, video_id, style)
+    payload = dict(fields, summary=summary, prompt_version=template.version)
+    archive_summary(video_id, language, style, payload)
+    return payload, 200
+
+def archive_summary(video_id, language, style, payload):
+    """Add a generated summary to the archive; failures are logged, never raised."""
+    if not summary_archive.enabled:
+        return
+    if not payload.get('title'):
+        # The response went out without waiting for metadata; by now it is normally cached
+        try:
+            payload = dict(payload, **metadata_fields(metadata_fetcher.get(video_id)))
+        except Exception as e:
+            print(f"Archiving {video_id} without a title: {str(e)}")
+    try:
+        with metrics.track('archive'):
+            summary_archive.add(video_id, language, style, payload)
+    except sqlite3.Error as e:
+        print(f"Summary archive write failed: {str(e)}")
+
+def summary_cache_key(video_id, language, style):
+    """Cache key for a finished summary, versioned by the prompt templates that produced it."""
+    return f"{video_id}:{language}:{style}:{prompt_version(language, style)}"
+
+def cache_summary(cache_key, payload):
+    """Store a successful summary payload in the summary cache."""
+    # Summaries built from metadata only are worth retrying sooner
+    ttl = None if payload.get('is_transcript') else SUMMARY_CACHE_FALLBACK_TTL
+    summary_cache.set(cache_key, payload, ttl)
+
+def _generate_and_cache(cache_key, style, generate, *args):
+    try:
+        with admission.slot(style), metrics.track('pipeline'):
+            payload, status = generate(*args)
+    except Overloaded as e:
+        return overloaded_payload(e), 429
+    if status == 200:
+        cache_summary(cache_key, payload)
+    return payload, status
+
+def wait_timeout_payload(style):
+    """Error payload for a request that waited too long on a generation it joined."""
+    return overloaded_payload(Overloaded("wait_timeout", admission.lane(style).retry_after()))
+
+def coalesced(cache_key, style, generate, *args):
+    """Run generate(*args) through _generate_and_cache, sharing the run with identical requests."""
+    try:
+        return summary_flight.do(cache_key, _generate_and_cache, cache_key, style, generate, *args)
+    except FlightTimeout:
+        return wait_timeout_payload(style), 429
+
+def summarize_video(video_id, language="en", style="standard", on_miss=None):
+    """
+    Cached and coalesced summary of a video: concurrent calls in this process for the
+    same video, language and style share one pipeline run. on_miss, if given, is called
+    before a summary that is not cached is generated and may raise to refuse it.
+    Returns (payload, http_status) with payload['cache'] set to 'hit' or 'miss'.
+    """
+    cache_key = summary_cache_key(video_id, language, style)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        metrics.record_summary(style, language, 'hit')
+        return dict(cached, cache='hit'), 200
+    
+    if on_miss is not None:
+        on_miss()
+    metrics.record_summary(style, language, 'miss')
+    payload, status = coalesced(cache_key, style, generate_summary, video_id, language, style)
+    return dict(payload, cache='miss'), status
+
 @app.route('/summarize', methods=['POST'])
 def summarize():
+    admission.check_client(client_id())
     try:
         data = request.json
         youtube_url = data.get('youtube_url')
@@ -354,153 +509,712 @@ def summarize():
                 'error_type': 'invalid_url'
             }), 400
         
-        # Try to get the transcript
-        try:
-            transcript = get_youtube_transcript(video_id, language)
+        payload, status = summarize_video(video_id, language, style)
+        return jsonify(payload), status
+    
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        traceback.print_exc()
+        return jsonify({
+            'error': ERROR_CODES["GENERAL_ERROR"]["message"],
+            'error_code': ERROR_CODES["GENERAL_ERROR"]["code"],
+            'error_type': 'general_error',
+            'details': str(e)
+        }), 500
+
+@app.route('/v1/summary/<video_id>', methods=['GET'])
+def summary_resource(video_id):
+    """
+    Cacheable form of /summarize: GET with ?language= and ?style=. The body is the same
+    for cache hits and misses and carries a strong ETag, so If-None-Match is answered with
+    304; large bodies are sent gzip or brotli compressed when the client accepts it.
+    """
+    if not VIDEO_ID_PATTERN.fullmatch(video_id):
+        return jsonify({
+            'error': ERROR_CODES["INVALID_URL"]["message"],
+            'error_code': ERROR_CODES["INVALID_URL"]["code"],
+            'error_type': 'invalid_url'
+        }), 400
+    # Every spelling of a language or style that gets the same prompt shares one cache
+    # entry and ETag, instead of each costing a generation of its own
+    language, style = normalize(request.args.get('language', 'en'), request.args.get('style', 'standard'))
+    
+    # Revalidating a summary that is already cached costs nothing, so only misses are charged
+    payload, status = summarize_video(video_id, language, style, on_miss=lambda: admission.check_client(client_id()))
+    if status != 200:
+        return jsonify(payload), status, {'Cache-Control': 'no-store'}
+    
+    body = canonical_json({k: v for k, v in payload.items() if k != 'cache'})
+    etag = strong_etag(body)
+    encoding = choose_encoding(request.accept_encodings, len(body))
+    max_age = SUMMARY_HTTP_MAX_AGE if payload.get('is_transcript') else SUMMARY_CACHE_FALLBACK_TTL
+    headers = {
+        'ETag': variant_etag(etag, encoding),
+        'Cache-Control': f'public, max-age={max_age}',
+        'Vary': 'Accept-Encoding'
+    }
+    if not_modified(request.if_none_match, etag):
+        return Response(status=304, headers=headers)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(encode(body, etag, encoding), mimetype='application/json', headers=headers)
+
+def as_list(value):
+    """A JSON list as is, and a single string or object as a one-item list; None otherwise."""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, (str, dict)):
+        return [value]
+    return None
+
+def read_targets(data):
+    """
+    (language, style) pairs asked for by a /summarize/multi body, in order and without
+    duplicates: {"targets": [{"language", "style"}, ...]}, or {"languages": [...],
+    "styles": [...]} for every combination of the two. A single string or target stands
+    for a list of one; values of any other type yield no pairs.
+    """
+    if 'targets' in data:
+        targets = as_list(data['targets']) or []
+        pairs = [
+            (str(target.get('language', 'en')), str(target.get('style', 'standard')))
+            for target in targets if isinstance(target, dict)
+        ]
+    else:
+        languages = as_list(data.get('languages') or data.get('language', 'en')) or []
+        styles = as_list(data.get('styles') or data.get('style', 'standard')) or []
+        pairs = [
+            (language, style) for language in languages for style in styles
+            if isinstance(language, str) and isinstance(style, str)
+        ]
+    return list(dict.fromkeys(pairs))
+
+def generate_target(video_id, content, text, language, style):
+    """Reduce step for one output of /summarize/multi from content resolved once for all of them."""
+    fields = dict(content['fields'])
+    if content['is_transcript']:
+        fields['transcript_source'] = transcript_source(content['language_code'], language)
+    return complete_summary(fields, text, language, content['is_transcript'], video_id, style)
+
+@app.route('/summarize/multi', methods=['POST'])
+def summarize_multi():
+    """
+    Several outputs (language x style) of one video from one request. The transcript is
+    fetched, preprocessed and, if long, condensed once; the outputs are then generated
+    concurrently and streamed back as newline-delimited JSON, one line per target as it
+    finishes, followed by a final summary line.
+    """
+    data = request.json or {}
+    youtube_url = data.get('youtube_url') or ''
+    
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return jsonify({
+            'error': ERROR_CODES["INVALID_URL"]["message"],
+            'error_code': ERROR_CODES["INVALID_URL"]["code"],
+            'error_type': 'invalid_url'
+        }), 400
+    
+    targets = read_targets(data)
+    if not targets or len(targets) > MULTI_MAX_TARGETS:
+        return jsonify({
+            'error': ERROR_CODES["INVALID_TARGETS"]["message"],
+            'error_code': ERROR_CODES["INVALID_TARGETS"]["code"],
+            'error_type': 'invalid_targets',
+            'max_targets': MULTI_MAX_TARGETS
+        }), 400
+    admission.check_client(client_id(), cost=len(targets))
+    
+    def results():
+        counts = {'succeeded': 0, 'failed': 0}
+        
+        def line(language, style, payload, status, cache):
+            counts['succeeded' if status == 200 else 'failed'] += 1
+            metrics.record_error(payload)
+            return json.dumps(dict(payload, language=language, style=style, http_status=status, cache=cache), ensure_ascii=False) + '\n'
+        
+        misses = []
+        for language, style in targets:
+            cache_key = summary_cache_key(video_id, language, style)
+            cached = summary_cache.get(cache_key)
+            metrics.record_summary(style, language, 'miss' if cached is None else 'hit')
+            if cached is not None:
+                yield line(language, style, cached, 200, 'hit')
+            else:
+                misses.append((language, style, cache_key))
+        
+        if misses:
+            # Everything before the reduce step is shared by all targets, so run it once
+            first_language, first_style, _ = misses[0]
+            content, text, error = None, None, None
+            try:
+                with admission.slot(first_style):
+                    content, error = resolve_content(video_id, first_language)
+                    if not error:
+                        text = prepare_text(video_id, content)
+            except Overloaded as e:
+                error = (overloaded_payload(e), 429)
+            except Exception as e:
+                print(f"Error with Gemini API: {str(e)}\n{traceback.format_exc()}")
+                error = ({
+                    'error': gemini_error_message(e),
+                    'error_code': ERROR_CODES["GEMINI_API_ERROR"]["code"],
+                    'error_type': 'gemini_api_error'
+                }, 500)
             
-            if transcript:
-                # We have a transcript, summarize it
-                summary = summarize_with_gemini(transcript, language, is_transcript=True, style=style)
-                
-                # Check if the summary contains error message
-                if summary.startswith("Error:"):
-                    return jsonify({
-                        'error': summary,
-                        'error_code': ERROR_CODES["GEMINI_API_ERROR"]["code"],
-                        'error_type': 'gemini_api_error'
-                    }), 500
-                
-                return jsonify({
-                    'summary': summary, 
-                    'is_transcript': True, 
-                    'has_minimal_info': False,
-                    'transcript_source': 'direct'
-                })
-        except VideoUnavailable:
-            return jsonify({
+            if error:
+                for language, style, _ in misses:
+                    yield line(language, style, error[0], error[1], 'miss')
+            else:
+                executor = ThreadPoolExecutor(max_workers=len(misses), thread_name_prefix="multi")
+                try:
+                    futures = {
+                        executor.submit(coalesced, cache_key, style, generate_target,
+                                        video_id, content, text, language, style): (language, style)
+                        for language, style, cache_key in misses
+                    }
+                    for future in as_completed(futures):
+                        language, style = futures[future]
+                        try:
+                            payload, status = future.result()
+                        except Exception as e:
+                            print(f"Output {language}/{style} of {video_id} failed: {str(e)}")
+                            payload, status = {
+                                'error': ERROR_CODES["GENERAL_ERROR"]["message"],
+                                'error_code': ERROR_CODES["GENERAL_ERROR"]["code"],
+                                'error_type': 'general_error'
+                            }, 500
+                        yield line(language, style, payload, status, 'miss')
+                finally:
+                    executor.shutdown(wait=False, cancel_futures=True)
+        
+        yield json.dumps(dict(counts, done=True, total=len(targets), video_id=video_id)) + '\n'
+    
+    return Response(stream_with_context(results()), mimetype='application/x-ndjson', headers={
+        'X-Accel-Buffering': 'no'
+    })
+
+def parse_seconds(value):
+    """Seconds from a finite number or an "[h:]mm:ss" timestamp string; None otherwise."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        try:
+            text = str(value).strip()
+            seconds = float(parse_timestamp(text)) if ':' in text else float(text)
+        except ValueError:
+            return None
+    return seconds if math.isfinite(seconds) else None
+
+def invalid_range_error():
+    return {
+        'error': ERROR_CODES["INVALID_RANGE"]["message"],
+        'error_code': ERROR_CODES["INVALID_RANGE"]["code"],
+        'error_type': 'invalid_range'
+    }, 400
+
+def find_chapter(chapters, chapter):
+    """Index of chapter, given as a 0-based index or a title, in chapters; None if absent."""
+    if isinstance(chapter, str) and chapter.strip().isdigit():
+        chapter = int(chapter)
+    if isinstance(chapter, int) and not isinstance(chapter, bool):
+        return chapter if 0 <= chapter < len(chapters) else None
+    title = str(chapter).strip().lower()
+    for index, item in enumerate(chapters):
+        if item['title'].lower() == title:
+            return index
+    return None
+
+def resolve_range(video_id, data):
+    """
+    Time range asked for by a /summarize/range body: 'start' and 'end' (seconds or
+    timestamps), or a 'chapter' of the video (index or title).
+    Returns ((start, end, chapter_title), None), where end is None for "until the end",
+    or (None, (error_payload, http_status)).
+    """
+    chapter = data.get('chapter')
+    if chapter is not None and chapter != '':
+        try:
+            metadata = metadata_fetcher.get(video_id)
+        except MetadataUnavailable as e:
+            print(f"Video unavailable: {str(e)}")
+            return None, ({
                 'error': ERROR_CODES["VIDEO_UNAVAILABLE"]["message"],
                 'error_code': ERROR_CODES["VIDEO_UNAVAILABLE"]["code"],
                 'error_type': 'video_unavailable'
-            }), 400
-        except Exception as e:
-            print(f"Transcript error: {str(e)}")
-            # Continue to metadata extraction
-        
-        # No direct transcript available, try to get video metadata
-        try:
-            # Get video info from YouTube
-            video_url = f'https://www.youtube.com/watch?v={video_id}'
-            response = requests.get(video_url, timeout=10)
-            
-            if response.status_code != 200:
-                return jsonify({
-                    'error': ERROR_CODES["VIDEO_UNAVAILABLE"]["message"],
-                    'error_code': ERROR_CODES["VIDEO_UNAVAILABLE"]["code"],
-                    'error_type': 'video_unavailable'
-                }), 400
-                
-            html_content = response.text
-            
-            # Extract title
-            title_match = re.search(r'<title>(.*?) - YouTube</title>', html_content)
-            title = title_match.group(1) if title_match else 'Unknown Title'
-            
-            # Extract description
-            desc_match = re.search(r'"description":{"simpleText":"(.*?)"}', html_content)
-            description = desc_match.group(1) if desc_match else ''
-            
-            # Clean up description (remove escape characters)
-            description = description.replace('\\n', '\n').replace('\\', '')
-            
-            # Build metadata text
-            metadata_text = f"Video Title: {title}\n\nVideo Description: {description}"
-            
-            # Use metadata for summarization if we have enough information
-            if len(metadata_text) > 100:  # At least some meaningful content
-                summary = summarize_with_gemini(metadata_text, language, is_transcript=False, style=style)
-                
-                # Check if the summary contains error message
-                if summary.startswith("Error:"):
-                    return jsonify({
-                        'error': summary,
-                        'error_code': ERROR_CODES["GEMINI_API_ERROR"]["code"],
-                        'error_type': 'gemini_api_error'
-                    }), 500
-                
-                return jsonify({
-                    'summary': summary, 
-                    'is_transcript': False, 
-                    'has_minimal_info': False,
-                    'warning': ERROR_CODES["NO_TRANSCRIPT"]["message"],
-                    'warning_code': ERROR_CODES["NO_TRANSCRIPT"]["code"]
-                })
-            else:
-                # If we don't have enough metadata, generate a minimal info message
-                summary = summarize_with_gemini(None, language, is_transcript=False, video_id=video_id, style=style)
-                
-                # Check if the summary contains error message
-                if summary.startswith("Error:"):
-                    return jsonify({
-                        'error': summary,
-                        'error_code': ERROR_CODES["GEMINI_API_ERROR"]["code"],
-                        'error_type': 'gemini_api_error'
-                    }), 500
-                
-                return jsonify({
-                    'summary': summary, 
-                    'is_transcript': False, 
-                    'has_minimal_info': True,
-                    'warning': ERROR_CODES["NO_TRANSCRIPT"]["message"],
-                    'warning_code': ERROR_CODES["NO_TRANSCRIPT"]["code"]
-                })
-                
+            }, 400)
         except requests.exceptions.RequestException as e:
             print(f"Network error: {str(e)}")
-            return jsonify({
+            return None, ({
                 'error': ERROR_CODES["NETWORK_ERROR"]["message"],
                 'error_code': ERROR_CODES["NETWORK_ERROR"]["code"],
                 'error_type': 'network_error'
-            }), 500
+            }, 500)
         except Exception as e:
-            print(f"Error gathering video info: {str(e)}")
-            traceback.print_exc()
-            
-            # If all else fails, generate a minimal info message
-            try:
-                summary = summarize_with_gemini(None, language, is_transcript=False, video_id=video_id, style=style)
-                
-                # Check if the summary contains error message
-                if summary.startswith("Error:"):
-                    return jsonify({
-                        'error': summary,
-                        'error_code': ERROR_CODES["GEMINI_API_ERROR"]["code"],
-                        'error_type': 'gemini_api_error'
-                    }), 500
-                
-                return jsonify({
-                    'summary': summary, 
-                    'is_transcript': False, 
-                    'has_minimal_info': True,
-                    'warning': ERROR_CODES["METADATA_EXTRACTION_ERROR"]["message"],
-                    'warning_code': ERROR_CODES["METADATA_EXTRACTION_ERROR"]["code"]
-                })
-            except Exception as inner_e:
-                print(f"Final error: {str(inner_e)}")
-                return jsonify({
-                    'error': ERROR_CODES["GENERAL_ERROR"]["message"],
-                    'error_code': ERROR_CODES["GENERAL_ERROR"]["code"],
-                    'error_type': 'general_error'
-                }), 500
+            print(f"Could not read chapters of {video_id}: {str(e)}")
+            return None, invalid_range_error()
+        
+        chapters = metadata['chapters']
+        index = find_chapter(chapters, chapter)
+        if index is None:
+            return None, invalid_range_error()
+        start = float(chapters[index]['start'])
+        if index + 1 < len(chapters):
+            end = float(chapters[index + 1]['start'])
+        else:
+            end = float(metadata['duration']) if metadata['duration'] else None
+        return (start, end, chapters[index]['title']), None
+    
+    start = parse_seconds(data.get('start', 0))
+    end = parse_seconds(data['end']) if data.get('end') not in (None, '') else None
+    if start is None or start < 0 or (data.get('end') not in (None, '') and (end is None or end <= start)):
+        return None, invalid_range_error()
+    return (start, end, None), None
+
+def generate_range_summary(video_id, language, style, start, end, chapter=None):
+    """
+    Summarize the transcript between start and end seconds (end None: until the end).
+    Long sections are condensed window by window first; see condense_range.
+    Returns a (payload, http_status) tuple.
+    """
+    content, error = resolve_content(video_id, language)
+    if error:
+        return error
+    if not content['is_transcript']:
+        # Metadata says nothing about a particular part of the video
+        return {
+            'error': ERROR_CODES["NO_TRANSCRIPT"]["message"],
+            'error_code': ERROR_CODES["NO_TRANSCRIPT"]["code"],
+            'error_type': 'no_transcript'
+        }, 422
+    
+    store = content['segments']
+    end = store.end if end is None else end
+    section = store.between(start, end)
+    if not len(section):
+        return invalid_range_error()
+    
+    text = section.text()
+    fields = dict(content['fields'], range={'start': start, 'end': end, 'chapter': chapter})
+    if estimate_tokens(text) > MAP_CHUNK_TOKENS:
+        try:
+            with metrics.track('map_reduce'):
+                text, chunks = condense_range(generate_with_gemini, video_id, store, start, end)
+        except Exception as e:
+            print(f"Error with Gemini API: {str(e)}\n{traceback.format_exc()}")
+            return {
+                'error': gemini_error_message(e),
+                'error_code': ERROR_CODES["GEMINI_API_ERROR"]["code"],
+                'error_type': 'gemini_api_error'
+            }, 500
+        fields['map_reduce_chunks'] = chunks
+    
+    label = f"{format_timestamp(start)} - {format_timestamp(end)}"
+    if chapter:
+        label += f' ("{chapter}")'
+    text = f"(Only the section {label} of the video follows. Summarize this section alone.)\n\n{text}"
+    return complete_summary(fields, text, language, True, video_id, style)
+
+@app.route('/summarize/range', methods=['POST'])
+def summarize_range():
+    """
+    Summarize part of a video: the /summarize body plus either "start"/"end" (seconds
+    or "h:mm:ss") or "chapter" (index or title). Summaries are cached per range, and
+    long ranges reuse the notes of time windows already condensed for overlapping ranges.
+    """
+    data = request.json or {}
+    youtube_url = data.get('youtube_url') or ''
+    language = data.get('language', 'en')
+    style = data.get('style', 'standard')
+    
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return jsonify({
+            'error': ERROR_CODES["INVALID_URL"]["message"],
+            'error_code': ERROR_CODES["INVALID_URL"]["code"],
+            'error_type': 'invalid_url'
+        }), 400
+    
+    admission.check_client(client_id())
+    bounds, error = resolve_range(video_id, data)
+    if error:
+        return jsonify(error[0]), error[1]
+    start, end, chapter = bounds
+    
+    cache_key = f"{summary_cache_key(video_id, language, style)}:range:{start:g}-{'end' if end is None else f'{end:g}'}"
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        metrics.record_summary(style, language, 'hit')
+        return jsonify(dict(cached, cache='hit'))
+    
+    metrics.record_summary(style, language, 'miss')
+    payload, status = coalesced(cache_key, style, generate_range_summary, video_id, language, style, start, end, chapter)
+    return jsonify(dict(payload, cache='miss')), status
+
+def read_batch_urls():
+    """
+    Collect the URLs of a batch request from a JSON body ({"urls": [...]}, or one
+    string of URLs), an uploaded text file ("file" field) or a plain-text body, one or
+    more per line. Anything else yields no URLs.
+    """
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8', 'ignore')
+        return [url for url in re.split(r'[\s,]+', text) if url]
+    if request.is_json:
+        urls = (request.json or {}).get('urls') or []
+        if isinstance(urls, str):
+            return [url for url in re.split(r'[\s,]+', urls) if url]
+        if not isinstance(urls, list):
+            return []
+        return [str(url).strip() for url in urls if str(url).strip()]
+    text = request.get_data(as_text=True)
+    return [url for url in re.split(r'[\s,]+', text) if url]
+
+@app.route('/summarize/batch', methods=['POST'])
+def summarize_batch():
+    """
+    Summarize many videos at once. URLs are normalized to video IDs and deduplicated,
+    then summarized concurrently. Results are streamed back as newline-delimited JSON,
+    one line per input URL in completion order, followed by a final summary line.
+    """
+    options = (request.json or {}) if request.is_json else request.form
+    language = options.get('language', 'en')
+    style = options.get('style', 'standard')
+    try:
+        concurrency = max(1, min(int(options.get('concurrency', BATCH_CONCURRENCY)), BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        concurrency = BATCH_CONCURRENCY
+    
+    urls = read_batch_urls()
+    if not urls or len(urls) > BATCH_MAX_URLS:
+        return jsonify({
+            'error': ERROR_CODES["INVALID_BATCH"]["message"],
+            'error_code': ERROR_CODES["INVALID_BATCH"]["code"],
+            'error_type': 'invalid_batch',
+            'max_urls': BATCH_MAX_URLS
+        }), 400
+    
+    # Normalize and dedupe before any network work
+    immediate = []
+    unique = {}
+    for index, url in enumerate(urls):
+        video_id = extract_video_id(url)
+        if not video_id:
+            immediate.append({
+                'index': index,
+                'url': url,
+                'http_status': 400,
+                'error': ERROR_CODES["INVALID_URL"]["message"],
+                'error_code': ERROR_CODES["INVALID_URL"]["code"],
+                'error_type': 'invalid_url'
+            })
+        elif video_id in unique:
+            immediate.append({'index': index, 'url': url, 'video_id': video_id, 'duplicate_of': unique[video_id][0]})
+        else:
+            unique[video_id] = (index, url)
+    admission.check_client(client_id(), cost=max(len(unique), 1))
     
+    def results():
+        counts = {'succeeded': 0, 'failed': 0}
+        for item in immediate:
+            if 'error' in item:
+                counts['failed'] += 1
+                metrics.record_error(item)
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+        
+        executor = ThreadPoolExecutor(max_workers=min(concurrency, len(unique) or 1), thread_name_prefix="batch")
+        try:
+            futures = {
+                executor.submit(summarize_video, video_id, language, style): (index, url, video_id)
+                for video_id, (index, url) in unique.items()
+            }
+            for future in as_completed(futures):
+                index, url, video_id = futures[future]
+                try:
+                    payload, status = future.result()
+                except Exception as e:
+                    print(f"Batch item {video_id} failed: {str(e)}")
+                    payload, status = {
+                        'error': ERROR_CODES["GENERAL_ERROR"]["message"],
+                        'error_code': ERROR_CODES["GENERAL_ERROR"]["code"],
+                        'error_type': 'general_error'
+                    }, 500
+                counts['succeeded' if status == 200 else 'failed'] += 1
+                metrics.record_error(payload)
+                yield json.dumps(dict(payload, index=index, url=url, video_id=video_id, http_status=status), ensure_ascii=False) + '\n'
+        finally:
+            # Stop queued work if the client goes away mid-batch
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        yield json.dumps(dict(counts, done=True, total=len(urls), unique=len(unique))) + '\n'
+    
+    return Response(stream_with_context(results()), mimetype='application/x-ndjson', headers={
+        'X-Accel-Buffering': 'no'
+    })
+
+def job_response(job):
+    """Public view of a job record."""
+    body = {
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+    if job['status'] in ('done', 'failed'):
+        body['http_status'] = job.get('http_status')
+        body['result'] = job.get('result') or {
+            'error': ERROR_CODES["GENERAL_ERROR"]["message"],
+            'error_code': ERROR_CODES["GENERAL_ERROR"]["code"],
+            'error_type': 'general_error'
+        }
+    return body
+
+def run_job(video_id, language, style):
+    payload, status = summarize_video(video_id, language, style)
+    metrics.record_error(payload)
+    return payload, status
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue a summary and return a job ID immediately. Poll GET /jobs/<job_id> for
+    the result. Identical jobs already in flight are shared rather than duplicated.
+    """
+    data = request.json or {}
+    youtube_url = data.get('youtube_url') or ''
+    language = data.get('language', 'en')
+    style = data.get('style', 'standard')
+    
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return jsonify({
+            'error': ERROR_CODES["INVALID_URL"]["message"],
+            'error_code': ERROR_CODES["INVALID_URL"]["code"],
+            'error_type': 'invalid_url'
+        }), 400
+    
+    admission.check_client(client_id())
+    cache_key = summary_cache_key(video_id, language, style)
+    job, coalesced = job_manager.submit(cache_key, run_job, video_id, language, style)
+    body = dict(job_response(job), coalesced=coalesced, status_url=f"/jobs/{job['job_id']}")
+    return jsonify(body), 202, {'Location': body['status_url']}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'error': ERROR_CODES["JOB_NOT_FOUND"]["message"],
+            'error_code': ERROR_CODES["JOB_NOT_FOUND"]["code"],
+            'error_type': 'job_not_found'
+        }), 404
+    return jsonify(job_response(job))
+
+@app.route('/summaries/<video_id>', methods=['GET'])
+def archived_summaries(video_id):
+    """Archived summaries of a video, optionally narrowed with ?language= and ?style=."""
+    if not VIDEO_ID_PATTERN.fullmatch(video_id):
+        return jsonify({
+            'error': ERROR_CODES["INVALID_URL"]["message"],
+            'error_code': ERROR_CODES["INVALID_URL"]["code"],
+            'error_type': 'invalid_url'
+        }), 400
+    
+    summaries = []
+    if summary_archive.enabled:
+        summaries = summary_archive.for_video(video_id, request.args.get('language'), request.args.get('style'))
+    if not summaries:
+        return jsonify({
+            'error': ERROR_CODES["NOT_ARCHIVED"]["message"],
+            'error_code': ERROR_CODES["NOT_ARCHIVED"]["code"],
+            'error_type': 'not_archived'
+        }), 404
+    return jsonify({'video_id': video_id, 'summaries': summaries})
+
+@app.route('/search', methods=['GET'])
+def search_summaries():
+    """
+    Full-text search of archived summaries by title and text: ?q= plus optional
+    ?language=, ?style= and ?limit=. Results carry a snippet around the match.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'error': ERROR_CODES["INVALID_QUERY"]["message"],
+            'error_code': ERROR_CODES["INVALID_QUERY"]["code"],
+            'error_type': 'invalid_query'
+        }), 400
+    
+    limit = request.args.get('limit', 20, type=int)
+    results = []
+    if summary_archive.enabled:
+        results = summary_archive.search(query, request.args.get('language'), request.args.get('style'), limit)
+    return jsonify({'query': query, 'count': len(results), 'results': results})
+
+def sse_event(event, data):
+    """Format one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def relay_generation(frames, cache_key, future, queue):
+    """
+    Run a /summarize/stream generation to the end: put each SSE frame it yields on queue,
+    then None, and hand its (payload, http_status) outcome to the summary_flight run.
+    """
+    outcome = ({
+        'error': ERROR_CODES["GENERAL_ERROR"]["message"],
+        'error_code': ERROR_CODES["GENERAL_ERROR"]["code"],
+        'error_type': 'general_error'
+    }, 500)
+    try:
+        while True:
+            queue.put(next(frames))
+    except StopIteration as stop:
+        outcome = stop.value
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
         traceback.print_exc()
+        metrics.record_error(outcome[0])
+        queue.put(sse_event('error', outcome[0]))
+    finally:
+        summary_flight.finish(cache_key, future, outcome)
+        queue.put(None)
+
+@app.route('/summarize/stream', methods=['POST'])
+def summarize_stream():
+    """
+    Same pipeline as /summarize, but the summary is streamed to the browser as
+    Server-Sent Events while Gemini generates it:
+      status - pipeline progress ({'stage': 'queued' | 'extracting' | 'condensing' | 'generating'})
+      meta   - response fields known before generation (is_transcript, warning, ...)
+      chunk  - a piece of summary text ({'text': ...})
+      error  - same payload as an error response from /summarize
+      done   - generation finished ({'cache': 'hit' | 'miss'})
+    """
+    data = request.json or {}
+    youtube_url = data.get('youtube_url') or ''
+    language = data.get('language', 'en')
+    style = data.get('style', 'standard')
+    
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
         return jsonify({
-            'error': ERROR_CODES["GENERAL_ERROR"]["message"],
-            'error_code': ERROR_CODES["GENERAL_ERROR"]["code"],
-            'error_type': 'general_error',
-            'details': str(e)
-        }), 500
+            'error': ERROR_CODES["INVALID_URL"]["message"],
+            'error_code': ERROR_CODES["INVALID_URL"]["code"],
+            'error_type': 'invalid_url'
+        }), 400
+    
+    admission.check_client(client_id())
+    cache_key = summary_cache_key(video_id, language, style)
+    cached = summary_cache.get(cache_key)
+    metrics.record_summary(style, language, 'miss' if cached is None else 'hit')
+    if cached is None and cache_key not in summary_flight:
+        # Turn the request away before the stream starts if its lane has no room
+        admission.check(style)
+    
+    def summary_events(payload, cache):
+        yield sse_event('meta', {k: v for k, v in payload.items() if k != 'summary'})
+        yield sse_event('chunk', {'text': payload['summary']})
+        yield sse_event('done', {'cache': cache})
+    
+    def events():
+        if cached is not None:
+            yield from summary_events(cached, 'hit')
+            return
+        
+        # Join a generation of the same summary already running in this process, from
+        # either endpoint, and send its result in one piece when it finishes
+        future, leader = summary_flight.begin(cache_key)
+        if not leader:
+            try:
+                payload, status = summary_flight.wait(future)
+            except FlightTimeout:
+                payload, status = wait_timeout_payload(style), 429
+            if status == 200:
+                yield from summary_events(payload, 'miss')
+            else:
+                yield sse_event('error', payload)
+            return
+        
+        # The generation runs on its own thread, so it finishes, is cached and is handed to
+        # whoever joined it at its own pace, even if this client reads slowly or goes away
+        frames = Queue()
+        threading.Thread(target=relay_generation, args=(generation(), cache_key, future, frames),
+                         name="stream", daemon=True).start()
+        while True:
+            frame = frames.get()
+            if frame is None:
+                return
+            yield frame
+    
+    def generation():
+        if admission.lane(style).full():
+            yield sse_event('status', {'stage': 'queued'})
+        try:
+            with admission.slot(style):
+                outcome = yield from generate_events()
+        except Overloaded as e:
+            outcome = overloaded_payload(e), 429
+            metrics.record_error(outcome[0])
+            yield sse_event('error', outcome[0])
+            return outcome
+        if outcome[1] == 200:
+            yield sse_event('done', {'cache': 'miss'})
+        return outcome
+    
+    def generate_events():
+        yield sse_event('status', {'stage': 'extracting'})
+        try:
+            content, error = resolve_content(video_id, language)
+        except Exception as e:
+            print(f"Unexpected error: {str(e)}")
+            traceback.print_exc()
+            content, error = None, ({
+                'error': ERROR_CODES["GENERAL_ERROR"]["message"],
+                'error_code': ERROR_CODES["GENERAL_ERROR"]["code"],
+                'error_type': 'general_error'
+            }, 500)
+        if error:
+            metrics.record_error(error[0])
+            yield sse_event('error', error[0])
+            return error
+        
+        parts = []
+        try:
+            if content['is_transcript'] and needs_map_reduce(content['text']):
+                yield sse_event('status', {'stage': 'condensing'})
+            text = prepare_text(video_id, content)
+            template = template_for(text, language, content['is_transcript'], video_id, style)
+            content['fields']['prompt_version'] = template.version
+            
+            yield sse_event('meta', content['fields'])
+            yield sse_event('status', {'stage': 'generating'})
+            for chunk in stream_with_gemini(text, language, is_transcript=content['is_transcript'], video_id=video_id, style=style):
+                parts.append(chunk)
+                yield sse_event('chunk', {'text': chunk})
+        except Exception as e:
+            print(f"Error with Gemini API: {str(e)}\n{traceback.format_exc()}")
+            payload = {
+                'error': gemini_error_message(e),
+                'error_code': ERROR_CODES["GEMINI_API_ERROR"]["code"],
+                'error_type': 'gemini_api_error'
+            }
+            metrics.record_error(payload)
+            yield sse_event('error', payload)
+            return payload, 500
+        
+        payload = dict(content['fields'], summary=''.join(parts))
+        cache_summary(cache_key, payload)
+        archive_summary(video_id, language, style, payload)
+        return payload, 200
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop reverse proxies such as nginx from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
 
 if __name__ == '__main__':
+    warmup.start()
     app.run(host='0.0.0.0', debug=True, port=5003)
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from cache import CACHE_DB_PATH, SQLiteConnections
+
+# Generated summaries are kept here indefinitely for /summaries and /search. Defaults to
+# the cache database; set SUMMRPRO_ARCHIVE_DB to an empty string to disable the archive.
+ARCHIVE_DB_PATH = os.getenv("SUMMRPRO_ARCHIVE_DB", CACHE_DB_PATH)
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+
+SNIPPET_CHARS = 200
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS archive ("
+    "id INTEGER PRIMARY KEY, video_id TEXT NOT NULL, language TEXT NOT NULL, "
+    "style TEXT NOT NULL, range TEXT NOT NULL DEFAULT '', title TEXT, "
+    "transcript_source TEXT, is_transcript INTEGER NOT NULL, prompt_version TEXT, "
+    "summary TEXT NOT NULL, payload TEXT NOT NULL, "
+    "created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+    "UNIQUE (video_id, language, style, range))",
+    "CREATE INDEX IF NOT EXISTS archive_updated ON archive (updated_at)",
+)
+
+# External-content FTS5 index over title and summary, kept in step by triggers
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS archive_fts USING fts5("
+    "title, summary, content='archive', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS archive_ai AFTER INSERT ON archive BEGIN "
+    "INSERT INTO archive_fts (rowid, title, summary) VALUES (new.id, new.title, new.summary); END",
+    "CREATE TRIGGER IF NOT EXISTS archive_ad AFTER DELETE ON archive BEGIN "
+    "INSERT INTO archive_fts (archive_fts, rowid, title, summary) VALUES ('delete', old.id, old.title, old.summary); END",
+    "CREATE TRIGGER IF NOT EXISTS archive_au AFTER UPDATE ON archive BEGIN "
+    "INSERT INTO archive_fts (archive_fts, rowid, title, summary) VALUES ('delete', old.id, old.title, old.summary); "
+    "INSERT INTO archive_fts (rowid, title, summary) VALUES (new.id, new.title, new.summary); END",
+)
+
+COLUMNS = "video_id, language, style, range, title, transcript_source, is_transcript, prompt_version, created_at, updated_at"
+
+
+def range_key(value):
+    """Archive key of a /summarize/range section; '' for a whole video."""
+    if not value:
+        return ""
+    end = "end" if value.get('end') is None else f"{value['end']:g}"
+    return f"{value['start']:g}-{end}"
+
+
+def match_query(query):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one as a prefix.
+    Words are quoted so punctuation and FTS operators in user input are taken literally.
+    """
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SummaryArchive:
+    """
+    Every generated summary, one row per video, language, style and range, searchable by
+    title and summary text. Uses an FTS5 index when SQLite has it and LIKE scans otherwise.
+    A metadata-only summary never replaces a transcript-based one.
+    """
+
+    def __init__(self, db_path=ARCHIVE_DB_PATH):
+        self._connections = SQLiteConnections(db_path) if db_path else None
+        self._schema_ready = False
+        self.fts = False
+
+    @property
+    def enabled(self):
+        return self._connections is not None
+
+    @contextmanager
+    def _conn(self):
+        with self._connections.connection() as conn:
+            if not self._schema_ready:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                try:
+                    for statement in FTS_SCHEMA:
+                        conn.execute(statement)
+                    self.fts = True
+                except sqlite3.OperationalError as e:
+                    print(f"Full-text search unavailable, falling back to LIKE: {str(e)}")
+                self._schema_ready = True
+            yield conn
+
+    def add(self, video_id, language, style, payload):
+        """Store or refresh the summary in payload (a successful /summarize response)."""
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO archive (video_id, language, style, range, title, transcript_source, "
+                "is_transcript, prompt_version, summary, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (video_id, language, style, range) DO UPDATE SET "
+                "title = excluded.title, transcript_source = excluded.transcript_source, "
+                "is_transcript = excluded.is_transcript, prompt_version = excluded.prompt_version, "
+                "summary = excluded.summary, payload = excluded.payload, updated_at = excluded.updated_at "
+                "WHERE excluded.is_transcript >= archive.is_transcript",
+                (
+                    video_id, language, style, range_key(payload.get('range')), payload.get('title'),
+                    payload.get('transcript_source'), int(bool(payload.get('is_transcript'))),
+                    payload.get('prompt_version'), payload['summary'],
+                    json.dumps(payload, ensure_ascii=False), now, now,
+                ),
+            )
+
+    def for_video(self, video_id, language=None, style=None):
+        """Archived summaries of a video, newest first, each with its full payload."""
+        sql = "SELECT language, style, created_at, updated_at, payload FROM archive WHERE video_id = ?"
+        sql, params = self._filter(sql, [video_id], language, style)
+        with self._conn() as conn:
+            rows = conn.execute(sql + " ORDER BY updated_at DESC", params).fetchall()
+        return [
+            dict(json.loads(payload), language=language, style=style, created_at=created_at, updated_at=updated_at)
+            for language, style, created_at, updated_at, payload in rows
+        ]
+
+    def search(self, query, language=None, style=None, limit=20):
+        """Summaries whose title or text contain every word of query, best matches first."""
+        limit = max(1, min(limit, SEARCH_MAX_RESULTS))
+        with self._conn() as conn:
+            if self.fts:
+                prefixed = ", ".join(f"archive.{column.strip()}" for column in COLUMNS.split(","))
+                sql = (
+                    f"SELECT {prefixed}, snippet(archive_fts, 1, '[', ']', '...', 24) "
+                    "FROM archive_fts JOIN archive ON archive.id = archive_fts.rowid "
+                    "WHERE archive_fts MATCH ?"
+                )
+                sql, params = self._filter(sql, [match_query(query)], language, style, prefix="archive.")
+                rows = conn.execute(sql + " ORDER BY bm25(archive_fts, 4.0, 1.0) LIMIT ?", params + [limit]).fetchall()
+            else:
+                sql = f"SELECT {COLUMNS}, substr(summary, 1, {SNIPPET_CHARS}) FROM archive WHERE 1"
+                params = []
+                for term in query.split():
+                    pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                    sql += " AND (title LIKE ? ESCAPE '\\' OR summary LIKE ? ESCAPE '\\')"
+                    params += [pattern, pattern]
+                sql, params = self._filter(sql, params, language, style)
+                rows = conn.execute(sql + " ORDER BY updated_at DESC LIMIT ?", params + [limit]).fetchall()
+        return [dict(self._entry(row[:-1]), snippet=row[-1]) for row in rows]
+
+    @staticmethod
+    def _filter(sql, params, language, style, prefix=""):
+        if language:
+            sql += f" AND {prefix}language = ?"
+            params.append(language)
+        if style:
+            sql += f" AND {prefix}style = ?"
+            params.append(style)
+        return sql, params
+
+    @staticmethod
+    def _entry(row):
+        entry = dict(zip((column.strip() for column in COLUMNS.split(",")), row))
+        entry['is_transcript'] = bool(entry['is_transcript'])
+        entry['range'] = entry['range'] or None
+        return entry
@@ -0,0 +1,9 @@
+"""WSGI entry point for benchmarks: the real app with YouTube and Gemini replaced by bench.fakes."""
+from bench import fakes
+
+fakes.install()
+
+import app as summrpro  # noqa: E402
+
+fakes.install_watch_pages(summrpro.metadata_fetcher)
+app = summrpro.app
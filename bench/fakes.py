@@ -0,0 +1,163 @@
+"""
+Local stand-ins for YouTube and Gemini so the app can be benchmarked with no network.
+Every knob is an environment variable because gunicorn workers inherit it from bench/run.py.
+"""
+import io
+import os
+import json
+import time
+import random
+import zlib
+import requests
+from requests.adapters import BaseAdapter
+from google.api_core import exceptions as google_exceptions
+from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled
+
+TRANSCRIPT_LATENCY = float(os.getenv("BENCH_TRANSCRIPT_LATENCY", "0.2"))
+TRANSCRIPT_FAILURE_RATE = float(os.getenv("BENCH_TRANSCRIPT_FAILURE_RATE", "0"))
+TRANSCRIPT_SEGMENTS = int(os.getenv("BENCH_TRANSCRIPT_SEGMENTS", "600"))
+TRANSCRIPT_LANGUAGES = os.getenv("BENCH_TRANSCRIPT_LANGUAGES", "en").split(",")
+WATCH_LATENCY = float(os.getenv("BENCH_WATCH_LATENCY", "0.3"))
+WATCH_FAILURE_RATE = float(os.getenv("BENCH_WATCH_FAILURE_RATE", "0"))
+WATCH_PAGE_BYTES = int(os.getenv("BENCH_WATCH_PAGE_BYTES", "900000"))
+GEMINI_LATENCY = float(os.getenv("BENCH_GEMINI_LATENCY", "2.0"))
+GEMINI_FAILURE_RATE = float(os.getenv("BENCH_GEMINI_FAILURE_RATE", "0"))
+GEMINI_OUTPUT_CHARS = int(os.getenv("BENCH_GEMINI_OUTPUT_CHARS", "3000"))
+GEMINI_STREAM_CHUNKS = int(os.getenv("BENCH_GEMINI_STREAM_CHUNKS", "20"))
+
+WORDS = ("the", "model", "video", "explains", "how", "data", "flows", "through", "each",
+         "stage", "and", "why", "latency", "matters", "for", "users", "watching", "today")
+
+
+def failed(rate):
+    return rate > 0 and random.random() < rate
+
+
+def video_rng(video_id):
+    """Random generator seeded by the video id, so every worker sees the same video."""
+    return random.Random(zlib.crc32(video_id.encode()))
+
+
+# Generated once so producing fake text costs next to nothing next to the app under test
+_sentence_rng = random.Random(0)
+SENTENCES = [" ".join(_sentence_rng.choice(WORDS) for _ in range(12)) for _ in range(512)]
+
+
+def sentence(rng):
+    return SENTENCES[rng.randrange(len(SENTENCES))]
+
+
+class FakeTranscript:
+    def __init__(self, video_id, language_code, is_generated):
+        self.video_id = video_id
+        self.language_code = language_code
+        self.language = language_code
+        self.is_generated = is_generated
+
+    def fetch(self):
+        time.sleep(TRANSCRIPT_LATENCY)
+        rng = video_rng(self.video_id)
+        return [
+            {'text': sentence(rng), 'start': index * 4.0, 'duration': 4.0}
+            for index in range(TRANSCRIPT_SEGMENTS)
+        ]
+
+
+class FakeTranscriptList:
+    def __init__(self, video_id):
+        self.transcripts = [FakeTranscript(video_id, code, True) for code in TRANSCRIPT_LANGUAGES]
+
+    def __iter__(self):
+        return iter(self.transcripts)
+
+
+def list_transcripts(video_id, proxies=None, cookies=None):
+    time.sleep(TRANSCRIPT_LATENCY)
+    if failed(TRANSCRIPT_FAILURE_RATE):
+        raise TranscriptsDisabled(video_id)
+    return FakeTranscriptList(video_id)
+
+
+def watch_page(video_id):
+    """A watch page of about WATCH_PAGE_BYTES with the player response in the middle."""
+    player_response = {
+        "playabilityStatus": {"status": "OK"},
+        "videoDetails": {
+            "title": f"Benchmark video {video_id}",
+            "shortDescription": "0:00 Intro\n5:00 Main part\n20:00 Wrap up",
+            "lengthSeconds": str(TRANSCRIPT_SEGMENTS * 4),
+            "author": "Bench",
+        },
+    }
+    script = b"<script>var ytInitialPlayerResponse = " + json.dumps(player_response).encode() + b";</script>"
+    padding = max(WATCH_PAGE_BYTES - len(script), 0)
+    return (
+        f"<html><head><title>Benchmark video {video_id} - YouTube</title></head>".encode()
+        + b"x" * (padding // 2) + script + b"y" * (padding - padding // 2)
+    )
+
+
+class FakeWatchAdapter(BaseAdapter):
+    """Serves synthetic youtube.com/watch pages to a requests session."""
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        time.sleep(WATCH_LATENCY)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        if failed(WATCH_FAILURE_RATE):
+            response.status_code = 503
+            response.raw = io.BytesIO()
+            return response
+        video_id = requests.utils.urlparse(request.url).query.split("v=")[-1]
+        response.status_code = 200
+        response.headers["Content-Type"] = "text/html; charset=utf-8"
+        response.raw = io.BytesIO(watch_page(video_id))
+        return response
+
+    def close(self):
+        pass
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Mimics genai.GenerativeModel.generate_content, including stream=True."""
+
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        if failed(GEMINI_FAILURE_RATE):
+            time.sleep(GEMINI_LATENCY / 10)
+            raise google_exceptions.ServiceUnavailable("benchmark failure")
+        rng = random.Random(zlib.crc32(prompt[-200:].encode()))
+        text = ""
+        while len(text) < GEMINI_OUTPUT_CHARS:
+            text += sentence(rng).capitalize() + ". "
+        text = text[:GEMINI_OUTPUT_CHARS]
+        if not stream:
+            time.sleep(GEMINI_LATENCY)
+            return FakeResponse(text)
+        return self._stream(text)
+
+    def _stream(self, text):
+        size = max(len(text) // GEMINI_STREAM_CHUNKS, 1)
+        for start in range(0, len(text), size):
+            time.sleep(GEMINI_LATENCY / GEMINI_STREAM_CHUNKS)
+            yield FakeResponse(text[start:start + size])
+
+
+def install():
+    """Patch the transcript API and Gemini; call before the app is imported."""
+    import gemini_client
+    YouTubeTranscriptApi.list_transcripts = staticmethod(list_transcripts)
+    gemini_client.load_genai().GenerativeModel = FakeGenerativeModel
+
+
+def install_watch_pages(fetcher):
+    """Route a MetadataFetcher's watch-page requests to FakeWatchAdapter."""
+    fetcher.session.mount("https://www.youtube.com/", FakeWatchAdapter())
@@ -0,0 +1,271 @@
+"""
+Load-test /summarize through gunicorn and the real gunicorn.conf.py, with YouTube and
+Gemini replaced by bench.fakes. Prints a JSON report (latency percentiles, requests/s,
+peak RSS) and can compare it against a previous report.
+
+    python -m bench.run --requests 200 --concurrency 16 --output bench.json
+    python -m bench.run --baseline bench.json --max-regression 0.2
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Command-line options forwarded to the workers as the bench.fakes environment variables
+FAKE_OPTIONS = {
+    "transcript_latency": ("BENCH_TRANSCRIPT_LATENCY", float, 0.2),
+    "transcript_failure_rate": ("BENCH_TRANSCRIPT_FAILURE_RATE", float, 0.0),
+    "transcript_segments": ("BENCH_TRANSCRIPT_SEGMENTS", int, 600),
+    "watch_latency": ("BENCH_WATCH_LATENCY", float, 0.3),
+    "watch_failure_rate": ("BENCH_WATCH_FAILURE_RATE", float, 0.0),
+    "watch_page_bytes": ("BENCH_WATCH_PAGE_BYTES", int, 900000),
+    "gemini_latency": ("BENCH_GEMINI_LATENCY", float, 2.0),
+    "gemini_failure_rate": ("BENCH_GEMINI_FAILURE_RATE", float, 0.0),
+    "gemini_output_chars": ("BENCH_GEMINI_OUTPUT_CHARS", int, 3000),
+}
+
+# Report fields where a larger value is a regression
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def video_ids(count):
+    """Deterministic 11-character video ids."""
+    return [f"bench{index:06d}"[:11] for index in range(count)]
+
+
+def process_tree(pid):
+    """pid and all of its descendants (Linux only)."""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RSSSampler(threading.Thread):
+    """Samples the summed RSS of the gunicorn master and its workers, keeping the peak."""
+
+    def __init__(self, pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak = max(self.peak, sum(rss_bytes(pid) for pid in process_tree(self.pid)))
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def start_server(args, workdir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY="bench",
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        SUMMRPRO_CACHE_DB=os.path.join(workdir, "summrpro.db"),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, "metrics"),
+        # The fakes are the bottleneck under test, not the quota
+        GEMINI_RPM="1000000",
+        GEMINI_TPM="1000000000",
+        # All load comes from one address; lanes still shed load as configured
+        ADMISSION_CLIENT_RPM=os.getenv("ADMISSION_CLIENT_RPM", "0"),
+        PYTHONPATH=ROOT,
+    )
+    for option, (variable, _, _) in FAKE_OPTIONS.items():
+        env[variable] = str(getattr(args, option))
+
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "bench.fake_app:app"]
+    if args.workers:
+        command[3:3] = ["--workers", str(args.workers)]
+    if args.worker_class:
+        env["GUNICORN_WORKER_CLASS"] = args.worker_class
+    log = open(os.path.join(workdir, "gunicorn.log"), "w")
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            log.close()
+            with open(log.name) as f:
+                raise RuntimeError(f"gunicorn exited with code {server.returncode}:\n{f.read()[-3000:]}")
+        try:
+            requests.get(f"{base_url}/metrics", timeout=5)
+            return server, base_url
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"gunicorn did not start within {args.startup_timeout}s")
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1] * 1000, 1) if quantiles else None
+
+
+def run_load(base_url, args):
+    """Send args.requests POST /summarize requests from args.concurrency threads."""
+    ids = video_ids(args.videos)
+    local = threading.local()
+
+    def send(index):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        body = {
+            "youtube_url": f"https://www.youtube.com/watch?v={ids[index % len(ids)]}",
+            "language": args.language,
+            "style": args.style,
+        }
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/summarize", json=body, timeout=args.request_timeout)
+            status = response.status_code
+            cache = response.json().get("cache") if status == 200 else None
+        except requests.exceptions.RequestException as e:
+            status, cache = type(e).__name__, None
+        return time.perf_counter() - start, status, cache
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(send, range(args.requests)))
+    return results, time.perf_counter() - start
+
+
+def summarize_results(results, duration):
+    latencies = [latency for latency, _, _ in results]
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    statuses = Counter(str(status) for _, status, _ in results)
+    return {
+        "requests": len(results),
+        "errors": sum(count for status, count in statuses.items() if status != "200"),
+        "status_counts": dict(statuses),
+        "cache_hits": sum(1 for _, _, cache in results if cache == "hit"),
+        "duration_s": round(duration, 3),
+        "rps": round(len(results) / duration, 2) if duration else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+        "p50_ms": percentile(quantiles, 50),
+        "p95_ms": percentile(quantiles, 95),
+        "p99_ms": percentile(quantiles, 99),
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, max_regression):
+    """Relative change of each metric against baseline, and the metrics that regressed."""
+    changes, regressions = {}, []
+    for metric in LOWER_IS_BETTER + ("rps",):
+        old, new = baseline["results"].get(metric), report["results"].get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        changes[metric] = round(change, 3)
+        worse = -change if metric == "rps" else change
+        if worse > max_regression:
+            regressions.append(metric)
+    return changes, regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test of /summarize")
+    parser.add_argument("--requests", type=int, default=100, help="total requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once")
+    parser.add_argument("--videos", type=int, default=50, help="distinct videos; fewer videos means more cache hits")
+    parser.add_argument("--workers", type=int, default=None, help="override gunicorn worker count")
+    parser.add_argument("--worker-class", default=None, help="override GUNICORN_WORKER_CLASS (gthread, gevent, sync)")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--style", default="standard")
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="relative slowdown that fails the run")
+    for option, (_, kind, default) in FAKE_OPTIONS.items():
+        parser.add_argument("--" + option.replace("_", "-"), type=kind, default=default)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="summrpro-bench-") as workdir:
+        server, base_url = start_server(args, workdir)
+        sampler = RSSSampler(server.pid)
+        sampler.start()
+        try:
+            results, duration = run_load(base_url, args)
+        finally:
+            sampler.stop()
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": dict(summarize_results(results, duration), peak_rss_mb=round(sampler.peak / 2 ** 20, 1) if sampler.peak else None),
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changes, regressions = compare(report, baseline, args.max_regression)
+        report["baseline"] = {"commit": baseline.get("commit"), "changes": changes, "regressions": regressions}
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
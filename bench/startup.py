@@ -0,0 +1,152 @@
+"""
+Measure cold start: how long importing the app and its heavy client libraries takes in a
+fresh interpreter, and how long gunicorn takes to become ready (first 200 from /healthz)
+and to replace a killed worker, with and without preloading in the master. Needs no
+network; the real app is served, but no request reaches YouTube or Gemini.
+
+    python -m bench.startup --runs 5 --output startup.json
+    python -m bench.startup --baseline startup.json --max-regression 0.2
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import requests
+from bench.run import ROOT, free_port, git_commit
+from startup import HEAVY_MODULES
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+
+def import_ms(module, runs, env):
+    """Median milliseconds to import module in a new interpreter."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)], cwd=ROOT, env=env
+        )
+        samples.append(float(output.decode().split()[-1]))
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def wait_ready(base_url, server, timeout, exclude_pid=None):
+    """Poll /healthz until a worker other than exclude_pid reports ready; returns its status."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+        try:
+            response = requests.get(f"{base_url}/healthz", timeout=5)
+            status = response.json()
+            if response.status_code == 200 and status["pid"] != exclude_pid:
+                return status
+        except (requests.exceptions.RequestException, ValueError):
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"gunicorn was not ready within {timeout}s")
+
+
+def boot(args, workdir, preload):
+    """Start gunicorn, time it to ready, then SIGKILL its worker and time the replacement."""
+    port = free_port()
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY="bench",
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_PRELOAD="1" if preload else "0",
+        SUMMRPRO_CACHE_DB=os.path.join(workdir, "summrpro.db"),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, "metrics"),
+        PYTHONPATH=ROOT,
+    )
+    if args.worker_class:
+        env["GUNICORN_WORKER_CLASS"] = args.worker_class
+    # One worker, so /healthz always answers from the worker being measured
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--workers", "1", "app:app"]
+    base_url = f"http://127.0.0.1:{port}"
+    with open(os.path.join(workdir, f"gunicorn-{int(preload)}.log"), "w") as log:
+        start = time.perf_counter()
+        server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            status = wait_ready(base_url, server, args.startup_timeout)
+            ready_ms = (time.perf_counter() - start) * 1000
+
+            os.kill(status["pid"], signal.SIGKILL)
+            start = time.perf_counter()
+            replacement = wait_ready(base_url, server, args.startup_timeout, exclude_pid=status["pid"])
+            respawn_ms = (time.perf_counter() - start) * 1000
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return {
+        "ready_ms": round(ready_ms, 1),
+        "respawn_ms": round(respawn_ms, 1),
+        "worker_warmup_seconds": replacement["warmup_seconds"],
+    }
+
+
+def compare(report, baseline, max_regression):
+    """Relative change of every timing against baseline, and the timings that regressed."""
+    changes, regressions = {}, []
+    for section, values in report["results"].items():
+        for metric, new in values.items():
+            old = baseline["results"].get(section, {}).get(metric)
+            if not isinstance(new, (int, float)) or not old:
+                continue
+            name = f"{section}.{metric}"
+            changes[name] = round((new - old) / old, 3)
+            if changes[name] > max_regression:
+                regressions.append(name)
+    return changes, regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per import measurement")
+    parser.add_argument("--worker-class", default=None, help="override GUNICORN_WORKER_CLASS (gthread, gevent, sync)")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="relative slowdown that fails the run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="summrpro-startup-") as workdir:
+        env = dict(os.environ, SUMMRPRO_CACHE_DB=os.path.join(workdir, "imports.db"), PYTHONPATH=ROOT)
+        imports = {module: import_ms(module, args.runs, env) for module in ("app",) + HEAVY_MODULES}
+        results = {"import_ms": imports, "preload": boot(args, workdir, True), "no_preload": boot(args, workdir, False)}
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changes, regressions = compare(report, baseline, args.max_regression)
+        report["baseline"] = {"commit": baseline.get("commit"), "changes": changes, "regressions": regressions}
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import sqlite3
+import weakref
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from metrics import CACHE_LOOKUPS
+
+# Default location of the shared on-disk cache. Set SUMMRPRO_CACHE_DB to an
+# empty string to run with the in-process tier only.
+DEFAULT_CACHE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "summrpro.db")
+CACHE_DB_PATH = os.getenv("SUMMRPRO_CACHE_DB", DEFAULT_CACHE_DB)
+# Seconds a statement waits for another process's write lock before failing. SQLite
+# waits inside C, so under gevent the whole worker stalls for that long; callers treat
+# the failure as a cache miss or fall back to an in-process limiter.
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a per-entry time to live."""
+
+    def __init__(self, maxsize=512, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def connect_sqlite(path):
+    """Open a SQLite connection tuned for many concurrent readers and writers."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Shared by every thread of the process; SQLiteConnections serializes its use
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SQLiteConnections:
+    """
+    One SQLite connection per process, used by one thread at a time. Under gevent,
+    thread-local storage is greenlet-local, so a connection per thread would become one
+    per request; here greenlets queue on a cooperative lock instead and only other
+    processes can keep SQLite busy. The connection is reopened after a fork so gunicorn
+    workers never share a handle with the master.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        _all_connections.add(self)
+
+    @contextmanager
+    def connection(self):
+        """Hold the process connection for a statement or transaction."""
+        with self._lock:
+            if self._conn is None:
+                self._conn = connect_sqlite(self.path)
+            yield self._conn
+
+    def _after_fork(self):
+        # The lock may have been held by a thread that did not survive the fork
+        self._lock = threading.Lock()
+        self._conn = None
+
+
+_all_connections = weakref.WeakSet()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: [pool._after_fork() for pool in list(_all_connections)])
+
+
+class SQLiteCache:
+    """
+    JSON key/value cache stored in a SQLite table. The database file is shared by
+    every gunicorn worker on the host and survives restarts.
+    """
+
+    # Expired rows are purged once every this many writes
+    PURGE_EVERY = 200
+
+    def __init__(self, path, table="cache", ttl=86400):
+        self.table = table
+        self.ttl = ttl
+        self._connections = SQLiteConnections(path)
+        self._writes = 0
+        self._schema_ready = False
+
+    @contextmanager
+    def _conn(self):
+        with self._connections.connection() as conn:
+            if not self._schema_ready:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "created_at REAL NOT NULL, expires_at REAL)"
+                )
+                self._schema_ready = True
+            yield conn
+
+    def get(self, key):
+        """
+        Return (value, expires_at) for key, or (None, None) if missing or expired.
+        expires_at is None for entries that never expire.
+        """
+        with self._conn() as conn:
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None, None
+        return json.loads(value), expires_at
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._conn() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                conn.execute(f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+
+    def delete(self, key):
+        with self._conn() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+
+class TieredCache:
+    """
+    Two-tier cache: a per-process LRU in front of an optional shared SQLite table.
+    Disk hits are promoted into memory for whatever lifetime they have left. Failures
+    of the disk tier are logged and treated as misses so a locked or read-only
+    database never breaks a request.
+    """
+
+    def __init__(self, name, maxsize=512, ttl=3600, db_path=CACHE_DB_PATH):
+        self.name = name
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteCache(db_path, table=name, ttl=ttl) if db_path else None
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            CACHE_LOOKUPS.labels(cache=self.name, result="memory_hit").inc()
+            return value
+        if self.disk is not None:
+            try:
+                value, expires_at = self.disk.get(key)
+            except sqlite3.Error as e:
+                print(f"{self.name} cache read failed: {str(e)}")
+                value = None
+            if value is not None:
+                CACHE_LOOKUPS.labels(cache=self.name, result="disk_hit").inc()
+                if expires_at is None:
+                    # ttl=0 stores without expiry, like the row on disk
+                    self.memory.set(key, value, 0)
+                else:
+                    remaining = expires_at - time.time()
+                    if remaining > 0:
+                        self.memory.set(key, value, remaining)
+                return value
+        CACHE_LOOKUPS.labels(cache=self.name, result="miss").inc()
+        return None
+
+    def set(self, key, value, ttl=None):
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, ttl)
+            except sqlite3.Error as e:
+                print(f"{self.name} cache write failed: {str(e)}")
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            try:
+                self.disk.delete(key)
+            except sqlite3.Error as e:
+                print(f"{self.name} cache delete failed: {str(e)}")
@@ -0,0 +1,311 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+import requests
+from contextlib import contextmanager
+from cache import CACHE_DB_PATH, SQLiteConnections
+from tokens import estimate_tokens
+from metrics import GEMINI_CALLS, GEMINI_CHARACTERS, track
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+GEMINI_REQUEST_TIMEOUT = float(os.getenv("GEMINI_REQUEST_TIMEOUT", "120"))
+# Process-wide (or, with the SQLite cache enabled, host-wide) Gemini quotas
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_RATE_LIMIT_WAIT = float(os.getenv("GEMINI_RATE_LIMIT_WAIT", "30"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1.0"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "20"))
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))
+
+# Transport errors worth retrying; Gemini's own retryable errors are added in is_retryable
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+# google.generativeai, and gRPC with it, is by far the slowest import of the app, so it is
+# loaded on first use (or by startup.preload in the gunicorn master) rather than at import
+genai = None
+_genai_lock = threading.Lock()
+
+
+def load_genai():
+    """Import and configure google.generativeai once, returning the module."""
+    global genai
+    with _genai_lock:
+        if genai is None:
+            import google.generativeai as module
+            # "rest" under gevent workers (see gunicorn.conf.py); empty keeps the library's gRPC default
+            module.configure(api_key=os.getenv("GEMINI_API_KEY"), transport=os.getenv("GEMINI_TRANSPORT") or None)
+            genai = module
+    return genai
+
+
+class GeminiRateLimited(Exception):
+    """The local request or token budget would not free up within the allowed wait."""
+
+
+class GeminiUnavailable(Exception):
+    """The circuit breaker is open because Gemini has been failing; the call was not attempted."""
+
+
+def is_retryable(e):
+    # Only a loaded client library can have raised its own exceptions
+    from google.api_core import exceptions as google_exceptions
+    return isinstance(e, RETRYABLE_ERRORS + (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServerError,
+        google_exceptions.Aborted,
+    ))
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _refill(tokens, updated_at, now, capacity, rate, amount, force):
+    """
+    Token bucket arithmetic shared by both bucket implementations.
+    Returns (tokens_left, seconds_to_wait); seconds_to_wait is 0 when amount was taken.
+    Requests larger than the whole bucket are let through once the bucket is full.
+    """
+    tokens = min(capacity, tokens + (now - updated_at) * rate)
+    needed = min(amount, capacity)
+    if force or tokens >= needed:
+        return tokens - amount, 0
+    return tokens, (needed - tokens) / rate
+
+
+class TokenBucket:
+    """In-process token bucket refilled continuously at per_minute / 60 tokens per second."""
+
+    def __init__(self, name, per_minute):
+        self.name = name
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def _take(self, amount, force=False):
+        with self._lock:
+            now = time.time()
+            self._tokens, wait = _refill(self._tokens, self._updated_at, now, self.capacity, self.rate, amount, force)
+            self._updated_at = now
+            return wait
+
+    def acquire(self, amount=1, max_wait=GEMINI_RATE_LIMIT_WAIT):
+        """Take amount tokens, sleeping until they are available or raising GeminiRateLimited."""
+        deadline = time.time() + max_wait
+        while True:
+            wait = self._take(amount)
+            if wait == 0:
+                return
+            if time.time() + wait > deadline:
+                raise GeminiRateLimited(f"Local {self.name} limit reached; retry in {wait:.0f}s")
+            time.sleep(wait)
+
+    def try_acquire(self, amount=1):
+        """Take amount tokens without waiting; returns 0, or the seconds until they would be available."""
+        return self._take(amount)
+
+    def debit(self, amount):
+        """Record usage that was not known up front (e.g. output tokens) without waiting."""
+        self._take(amount, force=True)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """Token bucket whose state lives in SQLite so every gunicorn worker draws from one budget."""
+
+    def __init__(self, name, per_minute, db_path, connections=None):
+        super().__init__(name, per_minute)
+        self._connections = connections or SQLiteConnections(db_path)
+        self._schema_ready = False
+
+    @contextmanager
+    def _conn(self):
+        with self._connections.connection() as conn:
+            if not self._schema_ready:
+                conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+                self._schema_ready = True
+            yield conn
+
+    def _take(self, amount, force=False):
+        try:
+            with self._conn() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = time.time()
+                    row = conn.execute("SELECT tokens, updated_at FROM rate_limits WHERE name = ?", (self.name,)).fetchone()
+                    tokens, updated_at = row if row else (self.capacity, now)
+                    tokens, wait = _refill(tokens, updated_at, now, self.capacity, self.rate, amount, force)
+                    conn.execute("INSERT OR REPLACE INTO rate_limits (name, tokens, updated_at) VALUES (?, ?, ?)", (self.name, tokens, now))
+                    conn.execute("COMMIT")
+                    return wait
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            print(f"Shared {self.name} limiter unavailable, using the local one: {str(e)}")
+            return super()._take(amount, force)
+
+
+class CircuitBreaker:
+    """
+    Fails fast after threshold consecutive upstream failures. After cooldown seconds one
+    trial call is let through; its success closes the circuit, its failure reopens it.
+    """
+
+    def __init__(self, threshold=GEMINI_BREAKER_THRESHOLD, cooldown=GEMINI_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return
+            # A trial that never reported back (e.g. it hit the rate limiter) expires too
+            if time.time() - self._opened_at >= self.cooldown:
+                self.state = 'half_open'
+                self._opened_at = time.time()
+                return
+            retry_in = max(0.0, self.cooldown - (time.time() - self._opened_at))
+            raise GeminiUnavailable(f"Gemini API is failing; calls are paused for {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.threshold:
+                if self.state != 'open':
+                    print(f"Gemini circuit opened after {self._failures} consecutive failures")
+                self.state = 'open'
+                self._opened_at = time.time()
+
+
+class GeminiClient:
+    """
+    Shared access to Gemini: reuses model objects, keeps requests within the configured
+    requests/tokens per minute, retries transient errors with jittered exponential
+    backoff, and stops calling Gemini for a while when it keeps failing.
+    """
+
+    def __init__(self, model_name=GEMINI_MODEL, db_path=CACHE_DB_PATH):
+        self.model_name = model_name
+        self._models = {}
+        self._lock = threading.Lock()
+        if db_path:
+            self.requests_bucket = SQLiteTokenBucket("gemini_requests", GEMINI_RPM, db_path)
+            self.tokens_bucket = SQLiteTokenBucket("gemini_tokens", GEMINI_TPM, db_path)
+        else:
+            self.requests_bucket = TokenBucket("gemini_requests", GEMINI_RPM)
+            self.tokens_bucket = TokenBucket("gemini_tokens", GEMINI_TPM)
+        self.breaker = CircuitBreaker()
+
+    def model(self, model_name=None):
+        model_name = model_name or self.model_name
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = load_genai().GenerativeModel(model_name=model_name)
+                self._models[model_name] = model
+            return model
+
+    def _admit(self, prompt):
+        try:
+            self.breaker.allow()
+        except GeminiUnavailable:
+            GEMINI_CALLS.labels(outcome="rejected").inc()
+            raise
+        self.requests_bucket.acquire(1)
+        self.tokens_bucket.acquire(estimate_tokens(prompt))
+
+    def _failed(self, e, attempt):
+        """Record a failed attempt; return True if the call should be retried."""
+        if not is_retryable(e):
+            # Gemini answered (e.g. a blocked prompt or a bad key), so it is reachable
+            self.breaker.record_success()
+            GEMINI_CALLS.labels(outcome="error").inc()
+            return False
+        self.breaker.record_failure()
+        if attempt >= GEMINI_MAX_RETRIES or self.breaker.state == 'open':
+            GEMINI_CALLS.labels(outcome="error").inc()
+            return False
+        GEMINI_CALLS.labels(outcome="retry").inc()
+        delay = backoff_delay(attempt)
+        print(f"Gemini call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+        time.sleep(delay)
+        return True
+
+    def generate(self, prompt):
+        """Generate text for prompt, raising the last error once retries are exhausted."""
+        attempt = 0
+        while True:
+            self._admit(prompt)
+            try:
+                with track("gemini"):
+                    response = self.model().generate_content(prompt, request_options={"timeout": GEMINI_REQUEST_TIMEOUT})
+                    text = response.text
+            except Exception as e:
+                if self._failed(e, attempt):
+                    attempt += 1
+                    continue
+                raise
+            self.breaker.record_success()
+            GEMINI_CALLS.labels(outcome="ok").inc()
+            GEMINI_CHARACTERS.labels(direction="input").inc(len(prompt))
+            GEMINI_CHARACTERS.labels(direction="output").inc(len(text))
+            self.tokens_bucket.debit(estimate_tokens(text))
+            return text
+
+    def stream(self, prompt):
+        """
+        Generate text for prompt with the streaming API, yielding chunks as they arrive.
+        Only failures before the first chunk are retried.
+        """
+        attempt = 0
+        while True:
+            self._admit(prompt)
+            parts = []
+            try:
+                for chunk in self.model().generate_content(prompt, stream=True, request_options={"timeout": GEMINI_REQUEST_TIMEOUT}):
+                    try:
+                        chunk_text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. a trailing finish reason) carry nothing to show
+                        continue
+                    if chunk_text:
+                        parts.append(chunk_text)
+                        yield chunk_text
+            except Exception as e:
+                if not parts and self._failed(e, attempt):
+                    attempt += 1
+                    continue
+                if parts and is_retryable(e):
+                    self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            if not parts:
+                GEMINI_CALLS.labels(outcome="error").inc()
+                raise ValueError("The content was blocked or Gemini returned an empty response")
+            output = ''.join(parts)
+            GEMINI_CALLS.labels(outcome="ok").inc()
+            GEMINI_CHARACTERS.labels(direction="input").inc(len(prompt))
+            GEMINI_CHARACTERS.labels(direction="output").inc(len(output))
+            self.tokens_bucket.debit(estimate_tokens(output))
+            return
@@ -0,0 +1,59 @@
+import os
+import shutil
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5003")
+
+# Requests spend nearly all their time waiting on YouTube and Gemini, so workers should
+# be cooperative: "gevent" serves worker_connections requests per process on greenlets,
+# "gthread" serves `threads` requests per process on OS threads. "sync" handles one.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+# Must outlast a Gemini call plus its retries; gevent and gthread workers keep heartbeating anyway
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Load the app, and the Gemini client library with it, once in the master so workers
+# fork with both already imported instead of each importing them on spawn.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# The gRPC transport does not cooperate with gevent's monkey patching; REST goes
+# through requests, which does.
+if worker_class == "gevent":
+    os.environ.setdefault("GEMINI_TRANSPORT", "rest")
+    # A SQLite busy wait blocks the event loop, and every greenlet on it, until it ends
+    os.environ.setdefault("SQLITE_BUSY_TIMEOUT", "0.5")
+    if preload_app:
+        # Patch before the master imports requests and ssl for the app, as the worker would
+        from gevent import monkey
+        monkey.patch_all()
+
+# Workers write metric samples here so /metrics can aggregate them across processes.
+# Must be set before the app (and prometheus_client) is imported by the workers.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/summrpro-metrics")
+# The master creates its metrics when it preloads the app, before on_starting runs
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be merged into the new one. The master's
+    # own files go too; it never records metrics, and forked workers write their own.
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+    if preload_app:
+        import startup
+        server.log.info("Preloaded client libraries in %s", startup.preload())
+
+
+def post_worker_init(worker):
+    # Warm this worker's clients in the background; /healthz reports ready once done
+    import startup
+    startup.warmup.start()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
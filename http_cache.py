@@ -0,0 +1,78 @@
+import os
+import gzip
+import json
+import hashlib
+from cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    # In requirements.txt; without it responses are offered gzip only
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; the saving would not cover the overhead
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1400"))
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+# Compressed bodies by (etag, encoding). An ETag names exact content, so entries never go
+# stale, and the slow high compression levels are paid once per summary per worker.
+_compressed = LRUCache(maxsize=256, ttl=None)
+
+
+def canonical_json(payload):
+    """Serialize payload the same way every time, so equal content gets an equal ETag."""
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def strong_etag(body):
+    """Quoted strong ETag derived from the bytes of body."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def variant_etag(etag, encoding):
+    """
+    The ETag of body sent with a content encoding. Strong ETags must differ between
+    representations, so the encoding is folded into the tag.
+    """
+    if not encoding:
+        return etag
+    return etag[:-1] + '-' + encoding + '"'
+
+
+def choose_encoding(accept_encodings, size):
+    """The best encoding the client accepts for a body of size bytes; None for identity."""
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def encode(body, etag, encoding):
+    """body compressed with encoding, cached by its ETag."""
+    if not encoding:
+        return body
+    key = (etag, encoding)
+    data = _compressed.get(key)
+    if data is None:
+        if encoding == 'br':
+            data = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            # A fixed mtime keeps the bytes, and so the variant ETag, the same across workers
+            data = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        _compressed.set(key, data)
+    return data
+
+
+def not_modified(if_none_match, etag):
+    """
+    Whether an If-None-Match header (werkzeug ETags) matches any representation of etag.
+    If-None-Match uses weak comparison, so W/ tags and every encoding variant count.
+    """
+    if if_none_match.star_tag:
+        return True
+    candidates = [etag] + [variant_etag(etag, encoding) for encoding in ('gzip', 'br')]
+    return any(if_none_match.contains_weak(candidate.strip('"')) for candidate in candidates)
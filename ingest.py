@@ -0,0 +1,189 @@
+"""
+Summarize many videos from the command line through the same cached pipeline as the API.
+URLs (or bare video IDs) are read one per line from a file or stdin, deduplicated by video
+ID, summarized by a pool of workers and appended to a JSONL file as each one finishes.
+The output doubles as the checkpoint: rerunning the same command skips every video that
+already has a successful line, so an interrupted run resumes where it stopped.
+
+    python ingest.py urls.txt --output summaries.jsonl --workers 8
+    cat urls.txt | python ingest.py - --output summaries.jsonl --style article
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import app as summrpro
+
+# Successful lines are forced to disk at least this often
+FSYNC_EVERY = 50
+# Give up on a video after this many consecutive 429s from the admission lanes
+MAX_OVERLOADED_RETRIES = 10
+
+
+def read_urls(stream):
+    """Yield (line_number, url) for every non-blank, non-comment line of stream."""
+    for number, line in enumerate(stream, 1):
+        url = line.strip()
+        if url and not url.startswith('#'):
+            yield number, url
+
+
+def parse_video_id(url):
+    if summrpro.VIDEO_ID_PATTERN.fullmatch(url):
+        return url
+    return summrpro.extract_video_id(url)
+
+
+def load_checkpoint(path):
+    """
+    Video IDs and invalid URLs already recorded in path. A line cut short by a crash is
+    dropped from the file so new results start on a line of their own.
+    """
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, 'rb+') as f:
+        valid_bytes = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            valid_bytes += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('http_status') == 200:
+                finished.add(record['video_id'])
+            elif record.get('error_type') == 'invalid_url':
+                finished.add(record['url'])
+        f.truncate(valid_bytes)
+    return finished
+
+
+def summarize(video_id, language, style):
+    """summarize_video, waiting out 429s from the admission lanes instead of failing."""
+    for _ in range(MAX_OVERLOADED_RETRIES):
+        payload, status = summrpro.summarize_video(video_id, language, style)
+        if status != 429:
+            return payload, status
+        time.sleep(payload.get('retry_after', 1))
+    return payload, status
+
+
+class ResultWriter:
+    """Appends JSONL records, flushing each and fsyncing every FSYNC_EVERY."""
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+        self.counts = {'succeeded': 0, 'failed': 0, 'invalid': 0}
+        self._unsynced = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+        self._unsynced += 1
+        if self._unsynced >= FSYNC_EVERY:
+            os.fsync(self.file.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+def run(urls, writer, finished, language, style, workers):
+    """
+    Summarize every new video in urls with a pool of workers, keeping at most twice as
+    many videos in flight as there are workers so huge inputs are streamed, not buffered.
+    """
+    seen = set()
+    counts = {'duplicates': 0, 'skipped': 0}
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            number, url, video_id = pending.pop(future)
+            try:
+                payload, status = future.result()
+            except Exception as e:
+                print(f"Ingest item {video_id} failed: {str(e)}", file=sys.stderr)
+                payload, status = {
+                    'error': summrpro.ERROR_CODES["GENERAL_ERROR"]["message"],
+                    'error_code': summrpro.ERROR_CODES["GENERAL_ERROR"]["code"],
+                    'error_type': 'general_error'
+                }, 500
+            writer.counts['succeeded' if status == 200 else 'failed'] += 1
+            writer.write(dict(payload, line=number, url=url, video_id=video_id, http_status=status))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as executor:
+        for number, url in urls:
+            video_id = parse_video_id(url)
+            if not video_id:
+                if url not in finished:
+                    writer.counts['invalid'] += 1
+                    writer.write({
+                        'line': number,
+                        'url': url,
+                        'http_status': 400,
+                        'error': summrpro.ERROR_CODES["INVALID_URL"]["message"],
+                        'error_code': summrpro.ERROR_CODES["INVALID_URL"]["code"],
+                        'error_type': 'invalid_url'
+                    })
+                    finished.add(url)
+                continue
+            if video_id in seen:
+                counts['duplicates'] += 1
+                continue
+            seen.add(video_id)
+            if video_id in finished:
+                counts['skipped'] += 1
+                continue
+
+            while len(pending) >= workers * 2:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            pending[executor.submit(summarize, video_id, language, style)] = (number, url, video_id)
+            collect([future for future in pending if future.done()])
+
+        while pending:
+            collect(wait(pending, return_when=FIRST_COMPLETED).done)
+    return dict(writer.counts, **counts)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a list of YouTube videos into a JSONL file")
+    parser.add_argument("input", help="file with one URL or video ID per line, or - for stdin")
+    parser.add_argument("--output", "-o", required=True, help="JSONL file to append results to; also the checkpoint")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--style", default="standard", choices=("standard", "teacher", "article"))
+    parser.add_argument("--workers", type=int, default=4, help="videos summarized at once")
+    parser.add_argument("--restart", action="store_true", help="discard the existing output instead of resuming")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    finished = load_checkpoint(args.output)
+    if finished:
+        print(f"Resuming: {len(finished)} videos already in {args.output}", file=sys.stderr)
+
+    stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    writer = ResultWriter(args.output)
+    start = time.time()
+    try:
+        counts = run(read_urls(stream), writer, finished, args.language, args.style, max(args.workers, 1))
+    finally:
+        writer.close()
+        if stream is not sys.stdin:
+            stream.close()
+
+    print(json.dumps(dict(counts, seconds=round(time.time() - start, 1))), file=sys.stderr)
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from cache import CACHE_DB_PATH, SQLiteCache
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+
+
+class FlightTimeout(Exception):
+    """A caller gave up waiting for the run it joined; the run itself carries on."""
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution. The first caller
+    runs the function; callers arriving while it runs wait, for at most timeout seconds,
+    for its result and share it.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def begin(self, key):
+        """
+        Join the call running for key, or start one. Returns (future, leader); a leader
+        must hand its outcome to finish() so the callers waiting on future are released.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        return future, leader
+
+    def finish(self, key, future, result=None, exception=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def wait(self, future):
+        """Result of a run joined with begin(), raising FlightTimeout after timeout seconds."""
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise FlightTimeout(f"gave up after {self.timeout}s") from None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, fn, *args, **kwargs):
+        future, leader = self.begin(key)
+        if not leader:
+            return self.wait(future)
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, future, exception=e)
+            raise
+        self.finish(key, future, result)
+        return result
+
+
+class JobManager:
+    """
+    Runs summary jobs on a local thread pool. A job submitted while an identical one
+    (same key) is queued or running attaches to that job instead of starting another.
+    Job records are mirrored to SQLite so any gunicorn worker can report their status.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, ttl=JOB_TTL, db_path=CACHE_DB_PATH):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._inflight = {}
+        self._store = SQLiteCache(db_path, table="jobs", ttl=ttl) if db_path else None
+
+    def _save(self, job):
+        job['updated_at'] = time.time()
+        if self._store is not None:
+            try:
+                self._store.set(job['job_id'], job)
+            except sqlite3.Error as e:
+                print(f"Could not persist job {job['job_id']}: {str(e)}")
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job['status'] in ('done', 'failed') and job['updated_at'] < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, key, fn, *args):
+        """
+        Queue fn(*args) -> (payload, http_status) as a job. Returns (job, coalesced)
+        where coalesced is True when an identical job was already in flight.
+        """
+        with self._lock:
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                return dict(self._jobs[job_id]), True
+
+            self._prune()
+            now = time.time()
+            job = {'job_id': uuid.uuid4().hex, 'status': 'queued', 'created_at': now, 'updated_at': now}
+            self._jobs[job['job_id']] = job
+            self._inflight[key] = job['job_id']
+            self._save(job)
+            snapshot = dict(job)
+
+        self._executor.submit(self._run, job, key, fn, args)
+        return snapshot, False
+
+    def _run(self, job, key, fn, args):
+        with self._lock:
+            job['status'] = 'running'
+            self._save(job)
+        try:
+            payload, http_status = fn(*args)
+            status = 'done' if http_status < 400 else 'failed'
+        except Exception as e:
+            print(f"Job {job['job_id']} failed: {str(e)}")
+            payload, http_status, status = None, 500, 'failed'
+        with self._lock:
+            job.update(status=status, result=payload, http_status=http_status)
+            self._inflight.pop(key, None)
+            self._save(job)
+
+    def get(self, job_id):
+        """Return a copy of a job record, looking in SQLite for jobs from other workers."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        if self._store is not None:
+            try:
+                return self._store.get(job_id)[0]
+            except sqlite3.Error as e:
+                print(f"Could not load job {job_id}: {str(e)}")
+        return None
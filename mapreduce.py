@@ -0,0 +1,138 @@
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from cache import TieredCache
+from tokens import estimate_tokens
+
+# Transcripts above this many estimated tokens are summarized chunk by chunk
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("MAP_REDUCE_THRESHOLD_TOKENS", "24000"))
+MAP_CHUNK_TOKENS = int(os.getenv("MAP_CHUNK_TOKENS", "6000"))
+MAP_REDUCE_WORKERS = int(os.getenv("MAP_REDUCE_WORKERS", "4"))
+CHUNK_NOTES_TTL = int(os.getenv("CHUNK_NOTES_TTL", str(7 * 24 * 3600)))
+# Time ranges are chunked on windows aligned to multiples of this many seconds
+RANGE_WINDOW_SECONDS = int(os.getenv("RANGE_WINDOW_SECONDS", "300"))
+
+# The map step is independent of the requested language and style, so its notes
+# can be reused when the same video is summarized again in another style.
+MAP_PROMPT = """
+You are taking detailed notes on one part of a longer video transcript.
+
+Transcript part {part} of {parts} ({start} - {end}):
+{text}
+
+Write thorough notes on this part in the same language as the transcript:
+1. Every main idea, argument and explanation, in the order presented
+2. Definitions of technical terms and the examples used to explain them
+3. Names, numbers, facts and conclusions worth keeping
+
+Do not add an introduction or conclusion, and do not summarize other parts of the video.
+"""
+MAP_PROMPT_VERSION = hashlib.sha256(MAP_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+# Bounds the number of chunk generations running at once in this process
+_executor = ThreadPoolExecutor(max_workers=MAP_REDUCE_WORKERS, thread_name_prefix="map")
+chunk_notes_cache = TieredCache("chunk_notes", maxsize=1024, ttl=CHUNK_NOTES_TTL)
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def needs_map_reduce(text):
+    return estimate_tokens(text) > MAP_REDUCE_THRESHOLD_TOKENS
+
+
+def split_segments(segments, max_tokens=MAP_CHUNK_TOKENS):
+    """
+    Group timed transcript segments into chunks of at most max_tokens estimated
+    tokens, never splitting a segment. Returns [{'text', 'start', 'end', 'tokens'}].
+    """
+    chunks = []
+    texts, tokens, start, end = [], 0, None, 0.0
+    for segment in segments:
+        segment_tokens = estimate_tokens(segment['text'])
+        if texts and tokens + segment_tokens > max_tokens:
+            chunks.append({'text': ' '.join(texts), 'start': start, 'end': end, 'tokens': tokens})
+            texts, tokens, start = [], 0, None
+        if start is None:
+            start = segment.get('start', 0.0)
+        texts.append(segment['text'])
+        tokens += segment_tokens
+        end = segment.get('start', 0.0) + segment.get('duration', 0.0)
+    if texts:
+        chunks.append({'text': ' '.join(texts), 'start': start, 'end': end, 'tokens': tokens})
+    return chunks
+
+
+def chunk_cache_key(video_id, chunk):
+    digest = hashlib.sha1(chunk['text'].encode("utf-8")).hexdigest()[:16]
+    return f"{video_id}:{digest}:{MAP_PROMPT_VERSION}"
+
+
+def summarize_chunk(generate, video_id, chunk, part, parts):
+    key = chunk_cache_key(video_id, chunk)
+    notes = chunk_notes_cache.get(key)
+    if notes is None:
+        prompt = MAP_PROMPT.format(
+            part=part,
+            parts=parts,
+            start=format_timestamp(chunk['start']),
+            end=format_timestamp(chunk['end']),
+            text=chunk['text'],
+        )
+        notes = generate(prompt)
+        chunk_notes_cache.set(key, notes)
+    return notes
+
+
+def map_chunks(generate, video_id, chunks):
+    """
+    Run the map step over chunks on the shared worker pool and return the notes
+    in chunk order. generate(prompt) -> text is the Gemini call to use; any error
+    it raises is propagated to the caller.
+    """
+    futures = [
+        _executor.submit(summarize_chunk, generate, video_id, chunk, index + 1, len(chunks))
+        for index, chunk in enumerate(chunks)
+    ]
+    return [future.result() for future in futures]
+
+
+def join_notes(header, chunks, notes):
+    """Label each chunk's notes with its part number and time range, under header."""
+    parts = [
+        f"[Part {index + 1} of {len(chunks)}, {format_timestamp(chunk['start'])} - {format_timestamp(chunk['end'])}]\n{chunk_notes.strip()}"
+        for index, (chunk, chunk_notes) in enumerate(zip(chunks, notes))
+    ]
+    return header + "\n\n" + "\n\n".join(parts)
+
+
+def condense_transcript(generate, video_id, segments):
+    """
+    Map step for long transcripts: summarize each chunk concurrently and join the
+    notes, labelled by part and time range, into the text for the reduce prompt.
+    Returns (text, number_of_chunks).
+    """
+    chunks = split_segments(segments)
+    notes = map_chunks(generate, video_id, chunks)
+    header = "(Detailed notes taken in order from each part of a long video transcript)"
+    return join_notes(header, chunks, notes), len(chunks)
+
+
+def condense_range(generate, video_id, store, start, end, window_seconds=RANGE_WINDOW_SECONDS):
+    """
+    Map step for a time range of a SegmentStore. Chunks never cross window boundaries,
+    so ranges that overlap produce identical chunks for their shared windows and reuse
+    the cached notes. Returns (text, number_of_chunks).
+    """
+    chunks = []
+    for _, _, window in store.windows(start, end, window_seconds):
+        chunks.extend(split_segments(window))
+    notes = map_chunks(generate, video_id, chunks)
+    header = "(Detailed notes taken in order from each part of one section of a video transcript)"
+    return join_notes(header, chunks, notes), len(chunks)
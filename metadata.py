@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cache import TieredCache
+from metrics import track
+
+METADATA_TTL = int(os.getenv("METADATA_TTL", str(6 * 3600)))
+# Stale entries are kept this long so they can be revalidated or served if YouTube is unreachable
+METADATA_STALE_TTL = int(os.getenv("METADATA_STALE_TTL", str(7 * 24 * 3600)))
+METADATA_TIMEOUT = float(os.getenv("METADATA_TIMEOUT", "10"))
+METADATA_POOL_SIZE = int(os.getenv("METADATA_POOL_SIZE", "16"))
+
+PLAYER_RESPONSE_MARKER = b"ytInitialPlayerResponse = "
+SCRIPT_END = b"</script>"
+# Watch pages are large; give up looking for the player response after this many bytes
+MAX_PAGE_BYTES = 4 * 1024 * 1024
+
+CHAPTER_LINE = re.compile(r'^\s*\(?((?:\d{1,2}:)?\d{1,2}:\d{2})\)?\s*[-–—:|]?\s*(.+?)\s*$')
+
+
+class MetadataUnavailable(Exception):
+    """YouTube reports the video as missing, private or otherwise unplayable."""
+
+
+class MetadataParseError(Exception):
+    """The watch page did not contain the metadata we look for."""
+
+
+def parse_timestamp(value):
+    seconds = 0
+    for part in value.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def parse_chapters(description):
+    """
+    Chapters as YouTube derives them from a description: at least two timestamped
+    lines, the first at 0:00. Returns [{'title', 'start'}] in order.
+    """
+    chapters = []
+    for line in (description or '').splitlines():
+        match = CHAPTER_LINE.match(line)
+        if match:
+            chapters.append({'title': match.group(2), 'start': parse_timestamp(match.group(1))})
+    if len(chapters) < 2 or chapters[0]['start'] != 0:
+        return []
+    return chapters
+
+
+def extract_player_response(chunks):
+    """
+    Find and decode the ytInitialPlayerResponse JSON while the page is still
+    downloading. Returns (player_response or None, bytes_read, head_of_page);
+    the caller can stop reading the response as soon as this returns.
+    """
+    buffer = bytearray()
+    start = -1
+    scan_from = 0
+    for chunk in chunks:
+        buffer += chunk
+        if start < 0:
+            start = buffer.find(PLAYER_RESPONSE_MARKER, max(0, scan_from - len(PLAYER_RESPONSE_MARKER)))
+            if start < 0:
+                scan_from = len(buffer)
+                if len(buffer) > MAX_PAGE_BYTES:
+                    break
+                continue
+            start += len(PLAYER_RESPONSE_MARKER)
+            scan_from = start
+        # JSON inside a script tag cannot contain "</script>", so its first occurrence ends the object
+        end = buffer.find(SCRIPT_END, max(start, scan_from - len(SCRIPT_END)))
+        if end < 0:
+            scan_from = len(buffer)
+            if len(buffer) > MAX_PAGE_BYTES:
+                break
+            continue
+        try:
+            player_response, _ = json.JSONDecoder().raw_decode(buffer[start:end].decode('utf-8', 'replace'))
+            return player_response, len(buffer), buffer
+        except ValueError:
+            return None, len(buffer), buffer
+    return None, len(buffer), buffer
+
+
+def metadata_from_player_response(player_response):
+    details = player_response.get('videoDetails') or {}
+    if not details:
+        # Age-restricted videos still carry videoDetails; removed or private ones do not
+        playability = player_response.get('playabilityStatus', {})
+        if playability.get('status') in ('ERROR', 'LOGIN_REQUIRED', 'UNPLAYABLE'):
+            raise MetadataUnavailable(playability.get('reason') or playability.get('status'))
+        raise MetadataParseError("Player response has no videoDetails")
+    description = details.get('shortDescription', '')
+    return {
+        'title': details.get('title') or 'Unknown Title',
+        'description': description,
+        'author': details.get('author', ''),
+        'duration': int(details.get('lengthSeconds') or 0),
+        'chapters': parse_chapters(description),
+    }
+
+
+def metadata_from_html(html_content):
+    """Fallback for pages without a parsable player response (e.g. consent interstitials)."""
+    title_match = re.search(r'<title>(.*?) - YouTube</title>', html_content)
+    if not title_match:
+        raise MetadataParseError("No title found in watch page")
+    desc_match = re.search(r'"description":{"simpleText":"(.*?)"}', html_content)
+    description = desc_match.group(1) if desc_match else ''
+    # Clean up description (remove escape characters)
+    description = description.replace('\\n', '\n').replace('\\', '')
+    return {
+        'title': title_match.group(1),
+        'description': description,
+        'author': '',
+        'duration': 0,
+        'chapters': parse_chapters(description),
+    }
+
+
+class MetadataFetcher:
+    """
+    Video metadata (title, description, author, duration, chapters) from the watch page,
+    fetched over a pooled session, parsed while streaming, and cached per video with
+    conditional revalidation once an entry goes stale.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=METADATA_POOL_SIZE, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+            'Accept-Language': 'en-US,en;q=0.9',
+        })
+        # Skip the EU consent interstitial, which has no video metadata
+        self.session.cookies.set('CONSENT', 'YES+cb', domain='.youtube.com')
+        self.cache = TieredCache("video_metadata", maxsize=2048, ttl=METADATA_STALE_TTL)
+        self._executor = ThreadPoolExecutor(max_workers=METADATA_POOL_SIZE, thread_name_prefix="metadata")
+
+    def get(self, video_id):
+        """
+        Return cached or freshly fetched metadata for a video.
+        Raises MetadataUnavailable, MetadataParseError or requests exceptions.
+        """
+        entry = self.cache.get(video_id)
+        if entry is not None and entry['fresh_until'] > time.time():
+            return entry['metadata']
+
+        try:
+            with track("metadata"):
+                return self._fetch(video_id, entry)
+        except requests.exceptions.RequestException as e:
+            if entry is not None:
+                print(f"Serving stale metadata for {video_id}: {str(e)}")
+                return entry['metadata']
+            raise
+
+    def prefetch(self, video_id):
+        """Start fetching metadata in the background; returns a Future."""
+        return self._executor.submit(self.get, video_id)
+
+    def _fetch(self, video_id, stale_entry=None):
+        headers = {}
+        if stale_entry is not None:
+            if stale_entry.get('etag'):
+                headers['If-None-Match'] = stale_entry['etag']
+            if stale_entry.get('last_modified'):
+                headers['If-Modified-Since'] = stale_entry['last_modified']
+
+        video_url = f'https://www.youtube.com/watch?v={video_id}'
+        with self.session.get(video_url, headers=headers, timeout=METADATA_TIMEOUT, stream=True) as response:
+            if response.status_code == 304 and stale_entry is not None:
+                stale_entry['fresh_until'] = time.time() + METADATA_TTL
+                self.cache.set(video_id, stale_entry)
+                return stale_entry['metadata']
+            if response.status_code != 200:
+                raise MetadataUnavailable(f"YouTube returned HTTP {response.status_code}")
+
+            player_response, bytes_read, page = extract_player_response(response.iter_content(chunk_size=16384))
+            if player_response is not None:
+                metadata = metadata_from_player_response(player_response)
+            else:
+                metadata = metadata_from_html(bytes(page).decode('utf-8', 'replace'))
+            print(f"Fetched metadata for {video_id} after reading {bytes_read} bytes")
+
+            self.cache.set(video_id, {
+                'metadata': metadata,
+                'fresh_until': time.time() + METADATA_TTL,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            })
+            return metadata
@@ -0,0 +1,104 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+# Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR (set up in
+# gunicorn.conf.py) and /metrics merges them, so any worker can answer a scrape.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Labels come from user input, so anything unexpected is folded into "other"
+KNOWN_STYLES = ("standard", "teacher", "article")
+KNOWN_LANGUAGES = ("en", "ar")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+HTTP_LATENCY = Histogram(
+    "summrpro_http_request_seconds", "Time to first byte of HTTP responses",
+    ["endpoint", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "summrpro_stage_seconds", "Time spent in each pipeline stage",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "summrpro_in_flight", "Pipeline stages currently running",
+    ["stage"], multiprocess_mode="livesum",
+)
+SUMMARIES = Counter(
+    "summrpro_summaries_total", "Summary requests by style, language and cache result",
+    ["style", "language", "cache"],
+)
+ERRORS = Counter(
+    "summrpro_errors_total", "Error responses by ERROR_CODES code",
+    ["code", "error_type"],
+)
+CACHE_LOOKUPS = Counter(
+    "summrpro_cache_lookups_total", "Cache lookups by cache and result (memory_hit, disk_hit, miss)",
+    ["cache", "result"],
+)
+GEMINI_CHARACTERS = Counter(
+    "summrpro_gemini_characters_total", "Characters sent to (input) and received from (output) Gemini",
+    ["direction"],
+)
+GEMINI_CALLS = Counter(
+    "summrpro_gemini_calls_total", "Gemini call attempts by outcome (ok, retry, error, rejected)",
+    ["outcome"],
+)
+ADMISSION = Gauge(
+    "summrpro_admission_requests", "Summary generations admitted (running) or queued (waiting) per lane",
+    ["lane", "state"], multiprocess_mode="livesum",
+)
+TOKENS_SAVED = Counter(
+    "summrpro_preprocess_tokens_saved_total", "Estimated prompt tokens removed by transcript preprocessing",
+)
+
+
+def style_label(style):
+    return style if style in KNOWN_STYLES else "other"
+
+
+def language_label(language):
+    return language if language in KNOWN_LANGUAGES else "other"
+
+
+@contextmanager
+def track(stage):
+    """Time a pipeline stage and count it as in flight while it runs."""
+    gauge = IN_FLIGHT.labels(stage=stage)
+    gauge.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+        gauge.dec()
+
+
+def record_summary(style, language, cache):
+    SUMMARIES.labels(style=style_label(style), language=language_label(language), cache=cache).inc()
+
+
+def record_error(payload):
+    """Count an error payload ({'error_code', 'error_type', ...}); other payloads are ignored."""
+    if payload and payload.get('error_code'):
+        ERRORS.labels(code=payload['error_code'], error_type=payload.get('error_type', 'unknown')).inc()
+
+
+def exposition():
+    """Return (body, content_type) for a /metrics scrape."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
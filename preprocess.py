@@ -0,0 +1,95 @@
+import os
+import re
+from tokens import char_counts, tokens_from_counts
+
+TRANSCRIPT_STRIP_MARKERS = os.getenv("TRANSCRIPT_STRIP_MARKERS", "1") == "1"
+TRANSCRIPT_DEDUPE = os.getenv("TRANSCRIPT_DEDUPE", "1") == "1"
+TRANSCRIPT_DROP_FILLERS = os.getenv("TRANSCRIPT_DROP_FILLERS", "0") == "1"
+
+# Sound and speaker annotations added by auto-captions: [Music], (Applause), ♪ ... ♪, >>
+MARKER_PATTERN = re.compile(r'\[[^\]]{1,40}\]|\((?:music|applause|laughter|laughs|inaudible|silence|cheering|crosstalk)\)|[♪♫]+|>>', re.IGNORECASE)
+FILLER_PATTERN = re.compile(r'\b(?:um+|uh+|erm+|hmm+|mm+|ah+)\b[,.]?', re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Caption overlaps (in words) treated as rolling auto-caption windows. Single repeated
+# words are left alone since speakers genuinely repeat them, and only segments that start
+# before the previous one has finished are compared.
+MIN_OVERLAP_WORDS = 2
+MAX_OVERLAP_WORDS = 20
+
+
+def strip_markers(text):
+    return MARKER_PATTERN.sub(' ', text)
+
+
+def drop_fillers(text):
+    return FILLER_PATTERN.sub(' ', text)
+
+
+def overlap_length(previous_words, words):
+    """Number of leading words of words that repeat the trailing words of previous_words."""
+    longest = min(len(previous_words), len(words), MAX_OVERLAP_WORDS)
+    for size in range(longest, MIN_OVERLAP_WORDS - 1, -1):
+        if previous_words[-size:] == words[:size]:
+            return size
+    return 0
+
+
+def clean_segments(segments, strip=None, dedupe=None, fillers=None):
+    """
+    Normalize timed transcript segments one at a time, yielding cleaned segment dicts
+    (same keys as the input). Segments left empty after cleaning are dropped.
+    """
+    strip = TRANSCRIPT_STRIP_MARKERS if strip is None else strip
+    dedupe = TRANSCRIPT_DEDUPE if dedupe is None else dedupe
+    fillers = TRANSCRIPT_DROP_FILLERS if fillers is None else fillers
+
+    previous_words = []
+    previous_end = None
+    for segment in segments:
+        text = segment['text']
+        if strip:
+            text = strip_markers(text)
+        if fillers:
+            text = drop_fillers(text)
+        words = WHITESPACE_PATTERN.sub(' ', text).strip().split(' ')
+        if words == ['']:
+            continue
+        if dedupe:
+            # Auto-captions roll: each window often repeats the end of the previous one
+            comparable = [word.lower() for word in words]
+            rolling = previous_end is not None and segment['start'] < previous_end
+            overlap = overlap_length(previous_words, comparable) if rolling else 0
+            previous_end = segment['start'] + segment['duration']
+            previous_words = (previous_words + comparable[overlap:])[-MAX_OVERLAP_WORDS:]
+            words = words[overlap:]
+            if not words:
+                continue
+        yield dict(segment, text=' '.join(words))
+
+
+def preprocess_transcript(segments, **options):
+    """
+    Run the normalization pipeline over a transcript's segments.
+    Returns (cleaned_segments, stats) where stats reports the characters and estimated
+    tokens of the joined transcript text before and after cleaning.
+    """
+    counts = {'in': [0, 0], 'out': [0, 0]}
+
+    def counted(source, key):
+        for segment in source:
+            total, ascii_chars = char_counts(segment['text'])
+            # +1 for the space that joins segments
+            counts[key][0] += total + 1
+            counts[key][1] += ascii_chars + 1
+            yield segment
+
+    cleaned = list(counted(clean_segments(counted(segments, 'in'), **options), 'out'))
+    tokens_in = tokens_from_counts(*counts['in'])
+    tokens_out = tokens_from_counts(*counts['out'])
+    return cleaned, {
+        'chars_in': max(counts['in'][0] - 1, 0),
+        'chars_out': max(counts['out'][0] - 1, 0),
+        'tokens_in': tokens_in,
+        'tokens_out': tokens_out,
+        'tokens_saved': tokens_in - tokens_out,
+    }
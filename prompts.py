@@ -0,0 +1,294 @@
+import os
+import hashlib
+import textwrap
+from preprocess import WHITESPACE_PATTERN, drop_fillers
+from tokens import estimate_tokens
+
+# Input-token budget for a whole summary prompt, per style. Longer texts are compressed
+# and then trimmed before sending, so a request never waits on a call that cannot succeed.
+PROMPT_BUDGETS = {
+    "standard": int(os.getenv("PROMPT_BUDGET_STANDARD", "32000")),
+    "teacher": int(os.getenv("PROMPT_BUDGET_TEACHER", "48000")),
+    "article": int(os.getenv("PROMPT_BUDGET_ARTICLE", "48000")),
+}
+STYLES = tuple(PROMPT_BUDGETS)
+LANGUAGES = ("en", "ar")
+
+# Trimmed text keeps this many evenly spaced excerpts so the whole video stays represented
+TRIM_EXCERPTS = 8
+TRIM_MARKER = " [...] "
+
+
+class PromptTemplate:
+    """
+    A prompt body with one placeholder, split once around it so rendering is a
+    concatenation. version is a short hash of the body.
+    """
+
+    __slots__ = ("name", "body", "prefix", "suffix", "version", "overhead_tokens")
+
+    def __init__(self, name, body, placeholder="text"):
+        self.name = name
+        self.body = textwrap.dedent(body).strip() + "\n"
+        self.prefix, found, self.suffix = self.body.partition("{" + placeholder + "}")
+        if not found:
+            raise ValueError(f"prompt {name} has no {{{placeholder}}} placeholder")
+        self.version = hashlib.sha256(self.body.encode("utf-8")).hexdigest()[:12]
+        self.overhead_tokens = estimate_tokens(self.prefix + self.suffix)
+
+    def render(self, value):
+        return self.prefix + value + self.suffix
+
+
+def compress(text):
+    """Cheap, lossless-enough shrinking: drop filler words and collapse whitespace."""
+    return WHITESPACE_PATTERN.sub(" ", drop_fillers(text)).strip()
+
+
+def trim(text, max_tokens):
+    """
+    Cut text to about max_tokens estimated tokens by keeping the start of TRIM_EXCERPTS
+    evenly spaced parts, so the summary still covers the beginning, middle and end.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    size = -(-len(text) // TRIM_EXCERPTS)
+    parts = [text[index:index + size] for index in range(0, len(text), size)]
+    ratio = max_tokens / tokens
+    while True:
+        excerpts = []
+        for part in parts:
+            keep = int(len(part) * ratio)
+            excerpt = part[:keep]
+            # Finish on a word boundary unless that would drop most of the excerpt
+            boundary = excerpt.rfind(" ")
+            if boundary > keep // 2:
+                excerpt = excerpt[:boundary]
+            excerpts.append(excerpt.strip())
+        trimmed = TRIM_MARKER.join(excerpt for excerpt in excerpts if excerpt)
+        if estimate_tokens(trimmed) <= max_tokens or ratio < 0.01:
+            return trimmed
+        ratio *= 0.95
+
+
+# Every prompt the app sends for a final summary, keyed by (language, style, is_transcript).
+# Metadata prompts are the same for every style; languages other than Arabic use English.
+TEMPLATES = {}
+
+NO_TEXT_TEMPLATES = {
+    "ar": PromptTemplate("ar:no_text", """
+        لم يتم العثور على نص للفيديو ذو المعرف {video_id}.
+
+        الرجاء تقديم وصف عام يشرح:
+        1. أن المحتوى لا يمكن تلخيصه بدون نص
+        2. الأسباب المحتملة لعدم توفر النص (مثل: الفيديو لا يحتوي على ترجمة، أو أن الترجمة غير متاحة، أو أن الفيديو خاص)
+        3. نصائح للمستخدم حول كيفية العثور على ملخصات أو معلومات بديلة
+        """, placeholder="video_id"),
+    "en": PromptTemplate("en:no_text", """
+        No transcript could be found for the video with ID {video_id}.
+
+        Please provide a general description explaining:
+        1. That the content cannot be summarized without a transcript
+        2. Possible reasons why the transcript is not available (e.g., video doesn't have captions, captions are disabled, or the video is private)
+        3. Tips for the user on how to find alternative summaries or information
+        """, placeholder="video_id"),
+}
+
+_BODIES = {
+    ("ar", "teacher", True): """
+        أنت معلم محترف ومتخصص. قم بشرح نص هذا الفيديو بالتفصيل الكامل كما لو كنت تشرحه لطلابك باللغة العربية، دون اختصار أي محتوى.
+
+        نص الفيديو (قد يكون بلغة أخرى، قم بترجمته وشرحه بالعربية):
+        {text}
+
+        يجب أن يتضمن الشرح:
+        1. مقدمة تعريفية شاملة بالموضوع وأهميته
+        2. شرح تفصيلي للأفكار الرئيسية بأسلوب تعليمي واضح
+        3. توضيح المفاهيم المعقدة والمصطلحات التقنية مع أمثلة متعددة سهلة الفهم
+        4. تقسيم المعلومات إلى أقسام منطقية وتسلسلية
+        5. شرح كل نقطة بالتفصيل مع ربطها بالواقع العملي والتطبيقات
+        6. خلاصة تلخص النقاط الأساسية وتربط الموضوع بالواقع العملي
+
+        استخدم أسلوباً تعليمياً يناسب شرح المعلم للطلاب، مع الحفاظ على المستوى العلمي للمحتوى.
+        هام: لا تقم باختصار المحتوى، بل قدّم شرحاً تفصيلياً كاملاً لكل محتوى الفيديو.
+        """,
+    ("ar", "article", True): """
+        أنت كاتب محترف ومتخصص في مجال المحتوى المعروض. قم بتحويل نص هذا الفيديو إلى مقالة احترافية تفصيلية باللغة العربية دون اختصار أي محتوى.
+
+        نص الفيديو (قد يكون بلغة أخرى، قم بترجمته وكتابته كمقالة كاملة بالعربية):
+        {text}
+
+        يجب أن تتضمن المقالة:
+        1. عنواناً جذاباً وفقرة افتتاحية قوية تمهد للموضوع
+        2. تطوير كامل وشامل للأفكار بأسلوب أدبي رصين
+        3. استخدام لغة احترافية تناسب المتخصصين في المجال
+        4. شرح تفصيلي لكل نقطة مع أمثلة توضيحية
+        5. تنظيم المحتوى في فقرات متماسكة وعناوين فرعية واضحة
+        6. تحليل عميق للمفاهيم والأفكار المطروحة
+        7. خاتمة تستخلص الأفكار الرئيسية وتقدم رؤية مستقبلية أو توصيات
+
+        اكتب المقالة كخبير متخصص في المجال، مع إظهار عمق المعرفة والخبرة المهنية.
+        هام: قدم تفاصيل كاملة دون اختصار، واشرح كل محتوى الفيديو بشكل شامل.
+        """,
+    ("ar", "standard", True): """
+        أنت مساعد محترف لتلخيص مقاطع الفيديو. قم بتلخيص نص هذا الفيديو بطريقة شاملة ومختصرة باللغة العربية.
+
+        نص الفيديو (قد يكون بلغة أخرى، قم بترجمته وتلخيصه بالعربية):
+        {text}
+
+        قدم ملخصًا مختصراً يغطي النقاط الرئيسية والمعلومات المهمة.
+
+        يجب أن يتضمن الملخص:
+        1. الأفكار والمفاهيم الرئيسية، مع التركيز على النقاط الأساسية
+        2. شرح مختصر للمصطلحات التقنية أو المعقدة إذا وجدت
+        3. تقسيم المعلومات إلى أقسام واضحة لسهولة القراءة
+        4. تغطية مختصرة للمحتوى دون إطالة غير ضرورية
+
+        قدم الملخص بتنسيق سهل القراءة، باستخدام النقاط والعناوين الفرعية عند الحاجة.
+        """,
+    ("ar", None, False): """
+        أنت مساعد محترف لتلخيص مقاطع الفيديو. استنادًا إلى المعلومات المتاحة عن هذا الفيديو، قم بإنشاء ملخص مفيد باللغة العربية.
+
+        معلومات الفيديو (قد تكون بلغة أخرى، قم بترجمتها وتلخيصها بالعربية):
+        {text}
+
+        حاول تقديم معلومات دقيقة وشاملة، مع العلم أن المعلومات المتاحة محدودة.
+
+        ضمّن في ملخصك:
+        1. الأفكار الرئيسية والمفاهيم المهمة بناءً على المعلومات المتاحة
+        2. تحليل لما يبدو أن الفيديو يدور حوله
+        3. تقسيم المعلومات إلى أقسام واضحة إن أمكن
+
+        قدم الملخص بتنسيق سهل القراءة.
+        ملاحظة: هذا الملخص يعتمد على معلومات محدودة وليس على المحتوى الكامل للفيديو.
+        """,
+    ("en", "teacher", True): """
+        You are a professional educator and subject matter expert. Explain this video transcript in FULL DETAIL as if you were teaching it to your students in English, without summarizing or omitting any content.
+
+        Video transcript (may be in another language, please translate to English and explain thoroughly):
+        {text}
+
+        Your explanation should include:
+        1. A comprehensive introduction that frames the topic and its importance
+        2. Detailed explanations of ALL ideas using educational techniques
+        3. Thorough clarification of complex concepts and technical terms with multiple easy-to-understand examples
+        4. Organization of information into logical, sequential sections
+        5. In-depth explanation of each point with practical applications
+        6. A conclusion that connects the topic to practical applications
+
+        Use a teaching style appropriate for a classroom setting while maintaining the academic integrity of the content.
+        IMPORTANT: Do NOT summarize the content. Provide a COMPLETE and DETAILED explanation of all video content.
+        """,
+    ("en", "article", True): """
+        You are a professional writer and subject matter expert in the presented content area. Transform this video transcript into a comprehensive professional article in English, without summarizing or omitting any content.
+
+        Video transcript (may be in another language, please translate to English and write as a full article):
+        {text}
+
+        The article should include:
+        1. A compelling headline and strong opening paragraph that introduces the topic
+        2. Full development of ALL ideas in a polished, literary style
+        3. Professional language appropriate for specialists in the field
+        4. Detailed explanation of each point with illustrative examples
+        5. Content organized into cohesive paragraphs with clear subheadings
+        6. In-depth analysis of concepts and ideas presented
+        7. A conclusion that draws out key insights and offers forward-looking perspectives or recommendations
+
+        Write the article as a domain expert, demonstrating depth of knowledge and professional expertise.
+        IMPORTANT: Provide COMPLETE details without summarizing, and fully explain all video content.
+        """,
+    ("en", "standard", True): """
+        You are a professional video summarizer. Summarize this video transcript in a clear, concise manner in English.
+
+        Video transcript (may be in another language, please translate to English and summarize):
+        {text}
+
+        Provide a concise summary that covers the key points and important information.
+
+        Your summary should include:
+        1. The main ideas and key concepts, with emphasis on the essential points
+        2. Brief explanations of technical or complex terms if present
+        3. Information broken down into clear sections for readability
+        4. Concise coverage of content without unnecessary verbosity
+
+        Present the summary in an easy-to-read format, using bullet points and subheadings when needed.
+        """,
+    ("en", None, False): """
+        You are a professional video summarizer. Based on the available information about this video, create a helpful summary in English.
+
+        Video information (may be in another language, please translate to English and summarize):
+        {text}
+
+        Try to provide accurate and comprehensive information, keeping in mind that the available information is limited.
+
+        Include in your summary:
+        1. The main ideas and important concepts based on the available information
+        2. An analysis of what the video appears to be about
+        3. Breakdown of information into clear sections if possible
+
+        Present the summary in an easy-to-read format.
+        NOTE: This summary is based on limited information and not the full video content.
+        """,
+}
+
+for (_language, _style, _is_transcript), _body in _BODIES.items():
+    _styles = (_style,) if _style else STYLES
+    _template = PromptTemplate(f"{_language}:{_style}" if _is_transcript else f"{_language}:metadata", _body)
+    for _each in _styles:
+        TEMPLATES[(_language, _each, _is_transcript)] = _template
+del _BODIES
+
+
+def normalize(language, style):
+    """Map any language/style to the pair whose templates are used for it."""
+    return ("ar" if language == "ar" else "en"), (style if style in STYLES else "standard")
+
+
+def template_for(text, language="en", is_transcript=True, video_id=None, style="standard"):
+    """The template render_prompt uses for these arguments."""
+    language, style = normalize(language, style)
+    if not text and video_id:
+        return NO_TEXT_TEMPLATES[language]
+    return TEMPLATES[(language, style, bool(is_transcript))]
+
+
+def fit_text(text, template, budget):
+    """Compress, then trim, text so the rendered prompt stays within budget tokens."""
+    available = budget - template.overhead_tokens
+    if estimate_tokens(text) <= available:
+        return text
+    compressed = compress(text)
+    trimmed = trim(compressed, available)
+    print(f"Fitted prompt {template.name} to {budget} tokens: {len(text)} -> {len(compressed)} -> {len(trimmed)} characters")
+    return trimmed
+
+
+def render_prompt(text, language="en", is_transcript=True, video_id=None, style="standard"):
+    """Return (prompt, template) for the given content, fitted to the style's token budget."""
+    template = template_for(text, language, is_transcript, video_id, style)
+    if not text and video_id:
+        return template.render(video_id), template
+    budget = PROMPT_BUDGETS[normalize(language, style)[1]]
+    return template.render(fit_text(text or "", template, budget)), template
+
+
+def prompt_version(language="en", style="standard"):
+    """
+    Short hash of every template that can be used for a language/style pair and of the
+    style's budget. Changing either changes the version and invalidates cached summaries.
+    """
+    return _VERSIONS[normalize(language, style)]
+
+
+_VERSIONS = {
+    (language, style): hashlib.sha256("\0".join([
+        TEMPLATES[(language, style, True)].version,
+        TEMPLATES[(language, style, False)].version,
+        NO_TEXT_TEMPLATES[language].version,
+        str(PROMPT_BUDGETS[style]),
+    ]).encode("utf-8")).hexdigest()[:12]
+    for language in LANGUAGES for style in STYLES
+}
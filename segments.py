@@ -0,0 +1,95 @@
+from array import array
+from bisect import bisect_left
+
+
+class SegmentStore:
+    """
+    Timed transcript segments held as parallel arrays (start and duration as doubles,
+    text as a list) sorted by start time, so time lookups are binary searches.
+    Iterating yields the usual {'text', 'start', 'duration'} dicts, so a store can
+    be passed anywhere a list of segments is expected.
+    """
+
+    __slots__ = ("starts", "durations", "texts")
+
+    def __init__(self, starts=None, durations=None, texts=None):
+        self.starts = starts if starts is not None else array("d")
+        self.durations = durations if durations is not None else array("d")
+        self.texts = texts if texts is not None else []
+
+    @classmethod
+    def from_segments(cls, segments):
+        store = cls()
+        ordered = sorted(segments, key=lambda segment: segment.get('start', 0.0))
+        for segment in ordered:
+            store.starts.append(segment.get('start', 0.0))
+            store.durations.append(segment.get('duration', 0.0))
+            store.texts.append(segment['text'])
+        return store
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Rebuild a store from to_columns() output, e.g. after a JSON round trip."""
+        return cls(array("d", columns['start']), array("d", columns['duration']), list(columns['text']))
+
+    @classmethod
+    def load(cls, value):
+        """Accept either to_columns() output or a plain list of segment dicts."""
+        if isinstance(value, dict):
+            return cls.from_columns(value)
+        return cls.from_segments(value)
+
+    def to_columns(self):
+        return {'start': self.starts.tolist(), 'duration': self.durations.tolist(), 'text': list(self.texts)}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        for start, duration, text in zip(self.starts, self.durations, self.texts):
+            yield {'text': text, 'start': start, 'duration': duration}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SegmentStore(self.starts[index], self.durations[index], self.texts[index])
+        return {'text': self.texts[index], 'start': self.starts[index], 'duration': self.durations[index]}
+
+    @property
+    def end(self):
+        """End time of the last segment, i.e. the covered length in seconds."""
+        if not self.texts:
+            return 0.0
+        return self.starts[-1] + self.durations[-1]
+
+    def _first_overlapping(self, start):
+        """Index of the first segment still playing at start."""
+        first = bisect_left(self.starts, start)
+        if first > 0 and self.starts[first - 1] + self.durations[first - 1] > start:
+            first -= 1
+        return first
+
+    def between(self, start, end):
+        """
+        Segments overlapping [start, end), as a new store. A segment that began before
+        start but is still playing at start is included.
+        """
+        return self[self._first_overlapping(start):bisect_left(self.starts, end)]
+
+    def windows(self, start, end, seconds):
+        """
+        Split [start, end) at multiples of seconds from the start of the video, yielding
+        (window_start, window_end, store). Ranges that overlap share their inner windows,
+        which makes those windows reusable cache units.
+        """
+        window_start = start
+        first = self._first_overlapping(start)
+        while window_start < end:
+            window_end = min((int(window_start // seconds) + 1) * seconds, end)
+            last = bisect_left(self.starts, window_end)
+            if last > first:
+                yield window_start, window_end, self[first:last]
+            first = max(first, last)
+            window_start = window_end
+
+    def text(self):
+        return ' '.join(self.texts)
@@ -0,0 +1,95 @@
+import os
+import time
+import importlib
+import threading
+
+# Client libraries the app imports on first use. The gunicorn master imports them up
+# front when preloading so forked workers start with them already loaded.
+HEAVY_MODULES = ("google.generativeai", "google.api_core.exceptions")
+# Warm each worker's clients in the background as soon as it starts
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
+# Close enough to process start for this module, which the app imports first
+IMPORTED_AT = time.monotonic()
+IMPORTED_PID = os.getpid()
+
+
+def preload():
+    """Import HEAVY_MODULES, returning {module: seconds}; meant for the gunicorn master."""
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = round(time.perf_counter() - start, 3)
+    return timings
+
+
+class Warmup:
+    """
+    Named warm-up steps run once per process on a background thread. Until they have all
+    run, status() reports the process as "starting"; a failed step is reported but does
+    not hold readiness back, since the same work is retried on the first request.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.timings = {}
+        self.errors = {}
+        self.ready_after = None
+        self.started_at = IMPORTED_AT
+        self._started = False
+        self._pid = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def add(self, name, step):
+        self.steps.append((name, step))
+
+    def start(self):
+        """Start warming up this process, once; safe to call from every request."""
+        with self._lock:
+            # A process forked from the master starts over with its own clients
+            if self._started and self._pid == os.getpid():
+                return
+            self._started = True
+            self._pid = os.getpid()
+            self._done = threading.Event()
+            self.timings, self.errors, self.ready_after = {}, {}, None
+            # Workers forked from a preloading master count from the fork
+            self.started_at = IMPORTED_AT if self._pid == IMPORTED_PID else time.monotonic()
+        threading.Thread(target=self.run, name="warmup", daemon=True).start()
+
+    def run(self):
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                print(f"Warm-up step {name} failed: {str(e)}")
+                self.errors[name] = str(e)
+            self.timings[name] = round(time.perf_counter() - start, 3)
+        self.ready_after = round(time.monotonic() - self.started_at, 3)
+        self._done.set()
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def status(self):
+        if not self.ready:
+            state = "starting"
+        else:
+            state = "degraded" if self.errors else "ok"
+        return {
+            'status': state,
+            'ready': self.ready,
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.monotonic() - self.started_at, 3),
+            'ready_after_seconds': self.ready_after,
+            'warmup_seconds': dict(self.timings),
+            'errors': dict(self.errors),
+        }
+
+
+# The process-wide warm-up; the app adds its steps and gunicorn starts it in each worker
+warmup = Warmup()
@@ -0,0 +1,62 @@
+import os
+import sys
+import pytest
+
+# Modules read their settings at import time: run with the in-memory tiers only, no
+# multiprocess metrics and no client rate limit, so tests never touch the repository's
+# .cache database. The bench fakes stand in for YouTube and Gemini with small, fast videos.
+os.environ["SUMMRPRO_CACHE_DB"] = ""
+os.environ["SUMMRPRO_ARCHIVE_DB"] = ""
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+os.environ.update(
+    GEMINI_API_KEY="test",
+    GEMINI_RPM="100000",
+    ADMISSION_CLIENT_RPM="0",
+    STARTUP_WARMUP="0",
+    BENCH_TRANSCRIPT_LATENCY="0",
+    BENCH_TRANSCRIPT_SEGMENTS="30",
+    BENCH_WATCH_LATENCY="0",
+    BENCH_WATCH_PAGE_BYTES="4000",
+    BENCH_GEMINI_LATENCY="0",
+    BENCH_GEMINI_OUTPUT_CHARS="600",
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def gemini_calls(monkeypatch):
+    """Prompts sent to the fake Gemini model, in order."""
+    from bench import fakes
+    calls = []
+    generate_content = fakes.FakeGenerativeModel.generate_content
+
+    def counted(self, prompt, stream=False, request_options=None):
+        calls.append(prompt)
+        return generate_content(self, prompt, stream=stream, request_options=request_options)
+
+    monkeypatch.setattr(fakes.FakeGenerativeModel, "generate_content", counted)
+    return calls
+
+
+@pytest.fixture
+def summrpro(gemini_calls):
+    """The app module wired to the bench fakes, with every in-process cache emptied."""
+    from bench import fakes
+    fakes.install()
+    import app as summrpro
+    import mapreduce
+    fakes.install_watch_pages(summrpro.metadata_fetcher)
+    caches = (
+        summrpro.summary_cache, summrpro.transcript_store.catalogs, summrpro.transcript_store.segments,
+        summrpro.metadata_fetcher.cache, mapreduce.chunk_notes_cache,
+    )
+    for cache in caches:
+        cache.memory.clear()
+    yield summrpro
+    summrpro.gemini.breaker.record_success()
+
+
+@pytest.fixture
+def client(summrpro):
+    return summrpro.app.test_client()
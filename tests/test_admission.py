@@ -0,0 +1,61 @@
+import time
+import threading
+import pytest
+from admission import AdmissionController, Lane, Overloaded
+
+VIDEO_URL = 'https://youtu.be/abcdefghijk'
+
+
+def test_lane_rejects_when_queue_is_full():
+    lane = Lane("t", slots=1, queue_size=0)
+    lane.enter()
+    with pytest.raises(Overloaded) as error:
+        lane.check()
+    assert error.value.reason == "queue_full"
+    lane.leave(1.0)
+    lane.check()
+
+
+def test_lane_queue_times_out():
+    lane = Lane("t", slots=1, queue_size=1)
+    lane.enter()
+    with pytest.raises(Overloaded) as error:
+        lane.enter(timeout=0.05)
+    assert error.value.reason == "queue_timeout"
+    assert lane.waiting == 0
+
+
+def test_lane_admits_waiter_when_slot_frees():
+    lane = Lane("t", slots=1, queue_size=1)
+    lane.enter()
+    admitted = threading.Event()
+
+    def wait_for_slot():
+        lane.enter(timeout=5)
+        admitted.set()
+
+    thread = threading.Thread(target=wait_for_slot)
+    thread.start()
+    time.sleep(0.05)
+    assert not admitted.is_set()
+    lane.leave(0.1)
+    thread.join(5)
+    assert admitted.is_set() and lane.running == 1
+
+
+def test_client_limit_is_per_client():
+    admission = AdmissionController(client_rpm=2)
+    admission.check_client("a", cost=2)
+    with pytest.raises(Overloaded) as error:
+        admission.check_client("a")
+    assert error.value.reason == "rate_limited" and error.value.retry_after >= 1
+    admission.check_client("b")
+
+
+def test_rate_limited_request_gets_retry_after(client, summrpro, monkeypatch):
+    monkeypatch.setattr(summrpro, "admission", AdmissionController(client_rpm=1))
+    assert client.post('/summarize', json={'youtube_url': VIDEO_URL}).status_code == 200
+    response = client.post('/summarize', json={'youtube_url': 'https://youtu.be/bcdefghijkl'})
+    assert response.status_code == 429
+    assert response.get_json()['error_code'] == 'E009'
+    assert int(response.headers['Retry-After']) >= 1
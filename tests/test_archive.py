@@ -0,0 +1,27 @@
+import pytest
+from archive import SummaryArchive
+
+VIDEO_URL = 'https://youtu.be/abcdefghijk'
+
+
+@pytest.fixture
+def archive(summrpro, tmp_path, monkeypatch):
+    archive = SummaryArchive(str(tmp_path / "archive.db"))
+    monkeypatch.setattr(summrpro, "summary_archive", archive)
+    return archive
+
+
+def test_summaries_are_archived_and_searchable(client, archive):
+    client.post('/summarize', json={'youtube_url': VIDEO_URL, 'style': 'teacher'})
+    summaries = client.get('/summaries/abcdefghijk').json['summaries']
+    assert [(item['language'], item['style']) for item in summaries] == [('en', 'teacher')]
+    results = client.get('/search', query_string={'q': 'benchmark video'}).json['results']
+    assert [result['video_id'] for result in results] == ['abcdefghijk']
+
+
+def test_archived_title_is_resolved_when_metadata_was_late(client, summrpro, archive, monkeypatch):
+    monkeypatch.setattr(summrpro, "optional_metadata_fields", lambda future: {})
+    response = client.post('/summarize', json={'youtube_url': VIDEO_URL})
+    assert 'title' not in response.json
+    results = client.get('/search', query_string={'q': 'benchmark'}).json['results']
+    assert [result['title'] for result in results] == ['Benchmark video abcdefghijk']
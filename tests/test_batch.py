@@ -0,0 +1,34 @@
+import json
+
+VIDEO_URL = 'https://youtu.be/abcdefghijk'
+
+
+def lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_batch_dedupes_and_reports_invalid_urls(client, gemini_calls):
+    urls = [VIDEO_URL, 'https://www.youtube.com/watch?v=abcdefghijk', 'not a url']
+    results = lines(client.post('/summarize/batch', json={'urls': urls}))
+    by_index = {result['index']: result for result in results if 'index' in result}
+    assert by_index[0]['http_status'] == 200 and by_index[0]['summary']
+    assert by_index[1]['duplicate_of'] == 0
+    assert by_index[2]['error_code'] == 'E001'
+    assert results[-1] == {'succeeded': 1, 'failed': 1, 'done': True, 'total': 3, 'unique': 1}
+    assert len(gemini_calls) == 1
+
+
+def test_batch_accepts_a_string_of_urls(client):
+    results = lines(client.post('/summarize/batch', json={'urls': f"{VIDEO_URL}, https://youtu.be/zzzzzzzzzzz\n"}))
+    assert results[-1]['total'] == 2 and results[-1]['succeeded'] == 2
+
+
+def test_batch_accepts_a_plain_text_body(client):
+    response = client.post('/summarize/batch', data=f"{VIDEO_URL}\nhttps://youtu.be/zzzzzzzzzzz", content_type='text/plain')
+    assert lines(response)[-1]['succeeded'] == 2
+
+
+def test_batch_rejects_bad_url_lists(client):
+    for urls in ([], {'a': VIDEO_URL}, 5):
+        response = client.post('/summarize/batch', json={'urls': urls})
+        assert response.status_code == 400 and response.json['error_code'] == 'E008'
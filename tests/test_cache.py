@@ -0,0 +1,71 @@
+import time
+from cache import LRUCache, SQLiteCache, TieredCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_lru_entry_ttl_overrides_default():
+    cache = LRUCache(ttl=3600)
+    cache.set("short", 1, 0.05)
+    cache.set("default", 2)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    assert cache.get("default") == 2
+
+
+def test_sqlite_get_returns_expiry(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), table="t", ttl=60)
+    before = time.time()
+    cache.set("k", {"v": 1})
+    cache.set("forever", 1, ttl=0)
+    value, expires_at = cache.get("k")
+    assert value == {"v": 1}
+    assert before + 60 <= expires_at <= time.time() + 60
+    assert cache.get("forever") == (1, None)
+    assert cache.get("missing") == (None, None)
+
+
+def test_sqlite_expired_entry_is_a_miss(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), table="t", ttl=60)
+    cache.set("k", 1, ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("k") == (None, None)
+
+
+def test_disk_hit_keeps_its_remaining_ttl(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    writer = TieredCache("t", ttl=3600, db_path=db_path)
+    reader = TieredCache("t", ttl=3600, db_path=db_path)
+    writer.set("k", "v", ttl=0.2)
+
+    assert reader.get("k") == "v"
+    time.sleep(0.3)
+    # Promoted from disk, but not for the tier's hour-long default
+    assert reader.get("k") is None
+
+
+def test_disk_hit_without_expiry_stays_in_memory(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    TieredCache("t", ttl=0.05, db_path=db_path).set("k", "v", ttl=0)
+    reader = TieredCache("t", ttl=0.05, db_path=db_path)
+    assert reader.get("k") == "v"
+    reader.disk.delete("k")
+    time.sleep(0.1)
+    assert reader.get("k") == "v"
+
+
+def test_delete_clears_both_tiers(tmp_path):
+    cache = TieredCache("t", db_path=str(tmp_path / "cache.db"))
+    cache.set("k", "v")
+    cache.delete("k")
+    assert cache.get("k") is None
+    assert cache.disk.get("k") == (None, None)
@@ -0,0 +1,91 @@
+import time
+import pytest
+import cache
+from google.api_core import exceptions as google_exceptions
+from gemini_client import CircuitBreaker, GeminiRateLimited, GeminiUnavailable, SQLiteTokenBucket, TokenBucket
+
+
+def test_token_bucket_reports_wait_when_empty():
+    bucket = TokenBucket("t", per_minute=60)
+    assert bucket.try_acquire(60) == 0
+    wait = bucket.try_acquire(1)
+    assert 0.9 < wait <= 1.0
+
+
+def test_token_bucket_lets_oversized_request_through_when_full():
+    bucket = TokenBucket("t", per_minute=60)
+    assert bucket.try_acquire(100) == 0
+    assert bucket.try_acquire(1) > 0
+
+
+def test_token_bucket_debit_goes_negative():
+    bucket = TokenBucket("t", per_minute=60)
+    bucket.debit(90)
+    assert bucket.try_acquire(1) > 30
+
+
+def test_token_bucket_acquire_gives_up_after_max_wait():
+    bucket = TokenBucket("t", per_minute=60)
+    bucket.debit(70)
+    with pytest.raises(GeminiRateLimited):
+        bucket.acquire(1, max_wait=0.1)
+
+
+def test_sqlite_token_bucket_is_shared(tmp_path):
+    db_path = str(tmp_path / "limits.db")
+    first = SQLiteTokenBucket("shared", 60, db_path)
+    second = SQLiteTokenBucket("shared", 60, db_path)
+    assert first.try_acquire(60) == 0
+    assert second.try_acquire(1) > 0
+
+
+def test_sqlite_token_bucket_falls_back_when_database_is_locked(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "SQLITE_BUSY_TIMEOUT", 0.05)
+    db_path = str(tmp_path / "limits.db")
+    bucket = SQLiteTokenBucket("shared", 60, db_path)
+    assert bucket.try_acquire(1) == 0
+    holder = cache.connect_sqlite(db_path)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        assert bucket.try_acquire(1) == 0
+        assert time.monotonic() - start < 1
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    with pytest.raises(GeminiUnavailable):
+        breaker.allow()
+
+    time.sleep(0.06)
+    breaker.allow()
+    assert breaker.state == 'half_open'
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_circuit_breaker_reopens_when_trial_fails():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(GeminiUnavailable):
+        breaker.allow()
+
+
+def test_error_messages_follow_exception_types(summrpro):
+    message = summrpro.gemini_error_message
+    assert "quota" in message(google_exceptions.ResourceExhausted("slow down"))
+    assert "quota" in message(GeminiRateLimited("local limit"))
+    assert "API key" in message(google_exceptions.PermissionDenied("denied"))
+    assert "temporarily unavailable" in message(GeminiUnavailable("open"))
+    # Words in the text of other errors no longer decide the message
+    assert message(ValueError("missing key in quota table")) == "Error generating summary: missing key in quota table"
@@ -0,0 +1,57 @@
+from werkzeug.http import parse_etags
+from http_cache import canonical_json, encode, not_modified, strong_etag, variant_etag
+import gzip
+import http_cache
+
+
+def test_etag_ignores_key_order():
+    assert strong_etag(canonical_json({'a': 1, 'b': 2})) == strong_etag(canonical_json({'b': 2, 'a': 1}))
+
+
+def test_not_modified_matches_every_variant():
+    etag = strong_etag(b"body")
+    for candidate in (etag, variant_etag(etag, 'gzip'), variant_etag(etag, 'br'), 'W/' + etag):
+        assert not_modified(parse_etags(candidate), etag)
+    assert not_modified(parse_etags('"other", ' + etag), etag)
+    assert not_modified(parse_etags('*'), etag)
+    assert not not_modified(parse_etags('"other"'), etag)
+    assert not not_modified(parse_etags(None), etag)
+
+
+def test_gzip_encoding_is_stable():
+    body = b"x" * 5000
+    etag = strong_etag(body)
+    data = encode(body, etag, 'gzip')
+    assert gzip.decompress(data) == body
+    assert encode(body, etag, 'gzip') is data
+    assert gzip.compress(body, compresslevel=9, mtime=0) == data
+
+
+def test_summary_resource_answers_revalidation_with_304(client, gemini_calls):
+    first = client.get('/v1/summary/abcdefghijk')
+    assert first.status_code == 200
+    assert first.headers['Vary'] == 'Accept-Encoding'
+    etag = first.headers['ETag']
+    assert etag == strong_etag(first.data)
+    revalidated = client.get('/v1/summary/abcdefghijk', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304 and not revalidated.data
+    assert revalidated.headers['ETag'] == etag
+    assert len(gemini_calls) == 1
+
+
+def test_summary_resource_compressed_variant_has_its_own_etag(client, monkeypatch):
+    monkeypatch.setattr(http_cache, "COMPRESS_MIN_BYTES", 0)
+    plain = client.get('/v1/summary/abcdefghijk', headers={'Accept-Encoding': 'identity'})
+    compressed = client.get('/v1/summary/abcdefghijk', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] == variant_etag(plain.headers['ETag'], 'gzip')
+    revalidated = client.get('/v1/summary/abcdefghijk', headers={'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_summary_resource_normalizes_language_and_style(client, gemini_calls):
+    first = client.get('/v1/summary/abcdefghijk')
+    second = client.get('/v1/summary/abcdefghijk', query_string={'language': 'EN', 'style': 'no-such-style'})
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert len(gemini_calls) == 1
@@ -0,0 +1,25 @@
+import json
+from ingest import load_checkpoint
+
+
+def test_load_checkpoint_collects_finished_entries(tmp_path):
+    path = tmp_path / "out.jsonl"
+    lines = [
+        {'video_id': 'aaaaaaaaaaa', 'http_status': 200},
+        {'video_id': 'bbbbbbbbbbb', 'http_status': 500},
+        {'url': 'not a url', 'http_status': 400, 'error_type': 'invalid_url'},
+    ]
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines) + "not json\n")
+    assert load_checkpoint(str(path)) == {'aaaaaaaaaaa', 'not a url'}
+
+
+def test_load_checkpoint_drops_partial_last_line(tmp_path):
+    path = tmp_path / "out.jsonl"
+    complete = json.dumps({'video_id': 'aaaaaaaaaaa', 'http_status': 200}) + "\n"
+    path.write_text(complete + '{"video_id": "bbbbb')
+    assert load_checkpoint(str(path)) == {'aaaaaaaaaaa'}
+    assert path.read_text() == complete
+
+
+def test_load_checkpoint_without_file(tmp_path):
+    assert load_checkpoint(str(tmp_path / "missing.jsonl")) == set()
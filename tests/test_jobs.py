@@ -0,0 +1,142 @@
+import time
+import threading
+import pytest
+from bench import fakes
+from jobs import FlightTimeout, SingleFlight
+
+VIDEO_URL = 'https://youtu.be/abcdefghijk'
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "done"
+
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+    leader.start()
+    started.wait(5)
+    assert "k" in flight
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert calls == [1]
+    assert results == ["done"] * 4
+    assert "k" not in flight
+
+
+def test_single_flight_shares_exceptions_and_forgets_the_key():
+    flight = SingleFlight()
+    future, leader = flight.begin("k")
+    assert leader
+    follower, follower_leads = flight.begin("k")
+    assert follower is future and not follower_leads
+    flight.finish("k", future, exception=ValueError("boom"))
+    with pytest.raises(ValueError):
+        follower.result()
+    assert flight.do("k", lambda: 1) == 1
+
+
+def test_single_flight_follower_times_out():
+    flight = SingleFlight(timeout=0.05)
+    future, _ = flight.begin("k")
+    with pytest.raises(FlightTimeout):
+        flight.do("k", lambda: 1)
+    flight.finish("k", future, 2)
+
+
+def test_jobs_coalesce_identical_requests(client, gemini_calls, monkeypatch):
+    monkeypatch.setattr(fakes, "GEMINI_LATENCY", 0.3)
+    first = client.post('/jobs', json={'youtube_url': VIDEO_URL}).json
+    second = client.post('/jobs', json={'youtube_url': VIDEO_URL}).json
+    assert not first['coalesced'] and second['coalesced']
+    assert second['job_id'] == first['job_id']
+
+    deadline = time.time() + 10
+    while (job := client.get(first['status_url']).json)['status'] not in ('done', 'failed'):
+        assert time.time() < deadline
+        time.sleep(0.02)
+    assert job['http_status'] == 200 and job['result']['summary']
+    assert len(gemini_calls) == 1
+    assert client.get('/jobs/unknown').json['error_code'] == 'E007'
+
+
+def stream(client, **body):
+    """Start /summarize/stream and return the unread response and its frame iterator."""
+    response = client.post('/summarize/stream', json=dict(youtube_url=VIDEO_URL, **body), buffered=False)
+    return response, iter(response.response)
+
+
+def test_summarize_joins_a_running_stream(client, summrpro, gemini_calls, monkeypatch):
+    monkeypatch.setattr(fakes, "GEMINI_LATENCY", 0.4)
+    response, frames = stream(client)
+    assert b'"stage": "extracting"' in next(frames)
+
+    results = []
+    joiner = threading.Thread(target=lambda: results.append(summrpro.app.test_client().post('/summarize', json={'youtube_url': VIDEO_URL})))
+    joiner.start()
+    body = b''.join(frames).decode()
+    joiner.join(10)
+
+    assert 'event: done' in body
+    assert results[0].status_code == 200 and results[0].json['summary']
+    assert len(gemini_calls) == 1
+
+
+def test_stream_disconnect_does_not_fail_joined_requests(client, summrpro, gemini_calls, monkeypatch):
+    monkeypatch.setattr(fakes, "GEMINI_LATENCY", 0.4)
+    response, frames = stream(client)
+    next(frames)
+    cache_key = summrpro.summary_cache_key('abcdefghijk', 'en', 'standard')
+    assert cache_key in summrpro.summary_flight
+
+    results = []
+    joiner = threading.Thread(target=lambda: results.append(summrpro.app.test_client().post('/summarize', json={'youtube_url': VIDEO_URL})))
+    joiner.start()
+    time.sleep(0.05)
+    response.close()
+    joiner.join(10)
+
+    assert results[0].status_code == 200 and results[0].json['summary']
+    assert summrpro.summary_cache.get(cache_key) is not None
+    assert len(gemini_calls) == 1
+
+
+def test_stream_joins_a_running_summary(client, summrpro, gemini_calls, monkeypatch):
+    monkeypatch.setattr(fakes, "GEMINI_LATENCY", 0.3)
+    results = []
+    leader = threading.Thread(target=lambda: results.append(summrpro.app.test_client().post('/summarize', json={'youtube_url': VIDEO_URL})))
+    leader.start()
+    cache_key = summrpro.summary_cache_key('abcdefghijk', 'en', 'standard')
+    deadline = time.time() + 5
+    while cache_key not in summrpro.summary_flight:
+        assert time.time() < deadline
+        time.sleep(0.005)
+
+    body = client.post('/summarize/stream', json={'youtube_url': VIDEO_URL}).get_data(as_text=True)
+    leader.join(10)
+    assert body.count('event: chunk') == 1 and '"cache": "miss"' in body
+    assert results[0].json['summary'] in body.replace('\\n', '\n')
+    assert len(gemini_calls) == 1
+
+
+def test_joined_request_gives_up_after_timeout(client, summrpro, monkeypatch):
+    monkeypatch.setattr(summrpro.summary_flight, "timeout", 0.05)
+    cache_key = summrpro.summary_cache_key('abcdefghijk', 'en', 'standard')
+    future, _ = summrpro.summary_flight.begin(cache_key)
+    try:
+        response = client.post('/summarize', json={'youtube_url': VIDEO_URL})
+        assert response.status_code == 429 and response.json['error_code'] == 'E010'
+        assert response.headers['Retry-After']
+        assert 'E010' in client.post('/summarize/stream', json={'youtube_url': VIDEO_URL}).get_data(as_text=True)
+    finally:
+        summrpro.summary_flight.finish(cache_key, future, None)
@@ -0,0 +1,31 @@
+import json
+import pytest
+
+VIDEO_URL = 'https://youtu.be/abcdefghijk'
+
+
+def summarize_multi(client, **body):
+    return client.post('/summarize/multi', json=dict(youtube_url=VIDEO_URL, **body))
+
+
+def test_multi_streams_one_line_per_target(client, gemini_calls):
+    response = summarize_multi(client, languages='ar', styles=['standard', 'teacher'])
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.data.decode().splitlines() if line]
+    assert sorted((line['language'], line['style']) for line in lines[:-1]) == [('ar', 'standard'), ('ar', 'teacher')]
+    assert lines[-1]['done'] and lines[-1]['succeeded'] == 2
+    assert len(gemini_calls) == 2
+
+
+@pytest.mark.parametrize("body", [
+    {'styles': 5},
+    {'targets': 'en'},
+    {'languages': {'en': True}},
+    {'targets': []},
+    {'languages': ['en', 'ar'], 'styles': ['a', 'b', 'c', 'd']},
+])
+def test_multi_rejects_targets_it_cannot_read(client, gemini_calls, body):
+    response = summarize_multi(client, **body)
+    assert response.status_code == 400
+    assert response.json['error_code'] == 'E012'
+    assert not gemini_calls
@@ -0,0 +1,67 @@
+from preprocess import clean_segments, preprocess_transcript
+
+
+def texts(segments, **options):
+    options.setdefault("dedupe", True)
+    return [segment["text"] for segment in clean_segments(segments, **options)]
+
+
+def test_rolling_caption_windows_are_collapsed():
+    segments = [
+        {"text": "we went to the", "start": 0.0, "duration": 4.0},
+        {"text": "to the store today", "start": 2.0, "duration": 4.0},
+    ]
+    assert texts(segments) == ["we went to the", "store today"]
+
+
+def test_repeat_after_previous_segment_ended_is_kept():
+    segments = [
+        {"text": "I think I think", "start": 0.0, "duration": 2.0},
+        {"text": "I think so", "start": 2.0, "duration": 1.0},
+    ]
+    assert texts(segments) == ["I think I think", "I think so"]
+
+
+def test_single_repeated_word_is_kept():
+    segments = [
+        {"text": "very", "start": 0.0, "duration": 2.0},
+        {"text": "very good", "start": 1.0, "duration": 2.0},
+    ]
+    assert texts(segments) == ["very", "very good"]
+
+
+def test_fully_repeated_window_is_dropped():
+    segments = [
+        {"text": "hello there friends", "start": 0.0, "duration": 3.0},
+        {"text": "There friends", "start": 1.0, "duration": 3.0},
+        {"text": "next words", "start": 4.0, "duration": 2.0},
+    ]
+    assert texts(segments) == ["hello there friends", "next words"]
+
+
+def test_dedupe_can_be_disabled():
+    segments = [
+        {"text": "we went to the", "start": 0.0, "duration": 4.0},
+        {"text": "to the store", "start": 2.0, "duration": 4.0},
+    ]
+    assert texts(segments, dedupe=False) == ["we went to the", "to the store"]
+
+
+def test_markers_are_stripped_and_empty_segments_dropped():
+    segments = [
+        {"text": "[Music]", "start": 0.0, "duration": 1.0},
+        {"text": ">> welcome (applause) back", "start": 1.0, "duration": 1.0},
+    ]
+    assert texts(segments, strip=True) == ["welcome back"]
+
+
+def test_preprocess_reports_savings():
+    segments = [
+        {"text": "[Music] hello world", "start": 0.0, "duration": 2.0},
+        {"text": "hello world again", "start": 1.0, "duration": 2.0},
+    ]
+    cleaned, stats = preprocess_transcript(segments, strip=True, dedupe=True, fillers=False)
+    assert [segment["text"] for segment in cleaned] == ["hello world", "again"]
+    assert stats["chars_in"] == len("[Music] hello world hello world again")
+    assert stats["chars_out"] == len("hello world again")
+    assert stats["tokens_saved"] == stats["tokens_in"] - stats["tokens_out"] > 0
@@ -0,0 +1,19 @@
+from prompts import TRIM_MARKER, trim
+from tokens import estimate_tokens
+
+
+def test_trim_leaves_short_text_alone():
+    assert trim("a short text", 100) == "a short text"
+
+
+def test_trim_fits_budget_and_keeps_every_part():
+    text = " ".join(f"part{index // 100}word{index}" for index in range(800))
+    trimmed = trim(text, 500)
+    assert estimate_tokens(trimmed) <= 500
+    assert trimmed.count(TRIM_MARKER.strip()) == 7
+    assert trimmed.startswith("part0word0")
+    assert "part7word" in trimmed
+
+
+def test_trim_to_nothing():
+    assert trim("some words here", 0) == ""
@@ -0,0 +1,38 @@
+import pytest
+
+VIDEO_URL = 'https://youtu.be/abcdefghijk'
+
+
+def summarize_range(client, **body):
+    return client.post('/summarize/range', json=dict(youtube_url=VIDEO_URL, **body))
+
+
+def test_range_summary_reports_its_bounds(client, gemini_calls):
+    response = summarize_range(client, start='0:10', end=40)
+    assert response.status_code == 200
+    assert response.json['range'] == {'start': 10.0, 'end': 40.0, 'chapter': None}
+    assert response.json['cache'] == 'miss'
+    assert "00:10 - 00:40" in gemini_calls[-1]
+    assert summarize_range(client, start=10, end='0:40').json['cache'] == 'hit'
+
+
+def test_range_summary_of_a_chapter(client):
+    response = summarize_range(client, chapter='intro')
+    assert response.status_code == 200
+    assert response.json['range'] == {'start': 0.0, 'end': 300.0, 'chapter': 'Intro'}
+
+
+@pytest.mark.parametrize("bounds", [
+    {'start': 'nan'},
+    {'start': 0, 'end': 'inf'},
+    {'start': '-inf'},
+    {'start': 40, 'end': 10},
+    {'start': 'soon'},
+    {'start': True},
+    {'chapter': 'Missing'},
+])
+def test_invalid_ranges_are_rejected(client, gemini_calls, bounds):
+    response = summarize_range(client, **bounds)
+    assert response.status_code == 400
+    assert response.json['error_code'] == 'E011'
+    assert not gemini_calls
@@ -0,0 +1,36 @@
+from segments import SegmentStore
+
+
+def store(*spans):
+    return SegmentStore.from_segments(
+        [{'text': f"s{index}", 'start': start, 'duration': duration} for index, (start, duration) in enumerate(spans)]
+    )
+
+
+def test_from_segments_sorts_by_start_and_round_trips():
+    segments = store((5.0, 1.0), (0.0, 2.0))
+    assert segments.texts == ["s1", "s0"]
+    assert list(SegmentStore.load(segments.to_columns())) == list(segments)
+    assert segments.end == 6.0
+
+
+def test_between_includes_segment_still_playing():
+    segments = store((0.0, 4.0), (4.0, 4.0), (8.0, 4.0))
+    assert segments.between(5.0, 8.0).texts == ["s1"]
+    assert segments.between(3.0, 9.0).texts == ["s0", "s1", "s2"]
+
+
+def test_windows_align_to_multiples_of_seconds():
+    segments = store(*[(float(start), 10.0) for start in range(0, 100, 10)])
+    windows = [(start, end, part.texts) for start, end, part in segments.windows(15.0, 65.0, 30)]
+    assert windows == [
+        (15.0, 30, ["s1", "s2"]),
+        (30, 60, ["s3", "s4", "s5"]),
+        (60, 65.0, ["s6"]),
+    ]
+
+
+def test_windows_skip_gaps_without_segments():
+    segments = store((0.0, 5.0), (70.0, 5.0))
+    windows = [(start, end, part.texts) for start, end, part in segments.windows(0.0, 90.0, 30)]
+    assert windows == [(0.0, 30, ["s0"]), (60, 90.0, ["s1"])]
@@ -0,0 +1,71 @@
+import pytest
+from youtube_transcript_api import TranscriptsDisabled, VideoUnavailable
+import transcripts
+from transcripts import TranscriptStore
+
+
+class FakeTranscript:
+    def __init__(self, language_code, is_generated, segments):
+        self.language_code = language_code
+        self.language = language_code
+        self.is_generated = is_generated
+        self.segments = segments
+
+    def fetch(self):
+        return self.segments
+
+
+@pytest.fixture
+def listings(monkeypatch):
+    """Map video IDs to a list of FakeTranscripts or an exception to raise; counts calls."""
+    results, calls = {}, []
+
+    def list_transcripts(video_id):
+        calls.append(video_id)
+        result = results[video_id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(transcripts.YouTubeTranscriptApi, "list_transcripts", staticmethod(list_transcripts))
+    return results, calls
+
+
+def test_choose_track_prefers_requested_manual_track():
+    tracks = [
+        {'language_code': 'en', 'is_generated': True},
+        {'language_code': 'de', 'is_generated': False},
+        {'language_code': 'en', 'is_generated': False},
+    ]
+    assert TranscriptStore.choose_track(tracks, 'en-US') == tracks[2]
+    assert TranscriptStore.choose_track(tracks, 'fr') == tracks[1]
+    assert TranscriptStore.choose_track([], 'en') is None
+
+
+def test_segments_are_fetched_once(listings):
+    results, calls = listings
+    results['abcdefghijk'] = [FakeTranscript('en', True, [{'text': 'hi', 'start': 0.0, 'duration': 1.0}])]
+    store = TranscriptStore()
+    for _ in range(2):
+        entry = store.get('abcdefghijk', 'en')
+        assert entry['language_code'] == 'en' and entry['segments'].texts == ['hi']
+    assert calls == ['abcdefghijk']
+
+
+def test_captionless_video_is_cached_as_none(listings):
+    results, calls = listings
+    results['abcdefghijk'] = TranscriptsDisabled('abcdefghijk')
+    store = TranscriptStore()
+    assert store.get('abcdefghijk') is None
+    assert store.get('abcdefghijk') is None
+    assert calls == ['abcdefghijk']
+
+
+def test_unavailable_video_raises_also_from_cache(listings):
+    results, calls = listings
+    results['abcdefghijk'] = VideoUnavailable('abcdefghijk')
+    store = TranscriptStore()
+    for _ in range(2):
+        with pytest.raises(VideoUnavailable):
+            store.get('abcdefghijk')
+    assert calls == ['abcdefghijk']
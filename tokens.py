@@ -0,0 +1,21 @@
+def char_counts(text):
+    """Return (total_chars, ascii_chars) for text."""
+    if not text:
+        return 0, 0
+    return len(text), len(text.encode("ascii", "ignore"))
+
+
+def tokens_from_counts(total_chars, ascii_chars):
+    """Token estimate from character counts; see estimate_tokens."""
+    if not total_chars:
+        return 0
+    return ascii_chars // 4 + (total_chars - ascii_chars) // 2 + 1
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of Gemini tokens in text without calling the API.
+    Latin script averages about four characters per token; Arabic and other
+    non-ASCII scripts are closer to two.
+    """
+    return tokens_from_counts(*char_counts(text))
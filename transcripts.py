@@ -0,0 +1,128 @@
+import os
+from youtube_transcript_api import (
+    YouTubeTranscriptApi,
+    TranscriptsDisabled,
+    VideoUnavailable,
+    NoTranscriptFound,
+    NoTranscriptAvailable,
+)
+from cache import TieredCache
+from segments import SegmentStore
+
+TRANSCRIPT_CATALOG_TTL = int(os.getenv("TRANSCRIPT_CATALOG_TTL", str(6 * 3600)))
+TRANSCRIPT_SEGMENTS_TTL = int(os.getenv("TRANSCRIPT_SEGMENTS_TTL", str(24 * 3600)))
+TRANSCRIPT_NEGATIVE_TTL = int(os.getenv("TRANSCRIPT_NEGATIVE_TTL", "900"))
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "128"))
+
+
+class TranscriptStore:
+    """
+    Caches, per video, the catalog of available caption tracks and the raw timed
+    segments of every track that has been fetched. Videos without usable captions
+    are remembered for a shorter time so repeat requests skip straight to metadata.
+    """
+
+    def __init__(self):
+        self.catalogs = TieredCache("transcript_catalogs", maxsize=TRANSCRIPT_CACHE_SIZE * 4, ttl=TRANSCRIPT_CATALOG_TTL)
+        self.segments = TieredCache("transcript_segments", maxsize=TRANSCRIPT_CACHE_SIZE, ttl=TRANSCRIPT_SEGMENTS_TTL)
+
+    def _list(self, video_id):
+        """List the caption tracks of a video, caching the catalog or the negative outcome."""
+        try:
+            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        except (TranscriptsDisabled, NoTranscriptFound, NoTranscriptAvailable) as e:
+            print(f"Could not get transcript in any language: {str(e)}")
+            self.catalogs.set(video_id, {'status': 'none'}, TRANSCRIPT_NEGATIVE_TTL)
+            return {'status': 'none'}, None
+        except VideoUnavailable as e:
+            print(f"Video unavailable: {str(e)}")
+            self.catalogs.set(video_id, {'status': 'unavailable'}, TRANSCRIPT_NEGATIVE_TTL)
+            return {'status': 'unavailable'}, None
+
+        # TranscriptList iterates manually created tracks first, then generated ones
+        catalog = {
+            'status': 'ok',
+            'tracks': [
+                {
+                    'language_code': transcript.language_code,
+                    'language': transcript.language,
+                    'is_generated': transcript.is_generated,
+                }
+                for transcript in transcript_list
+            ],
+        }
+        self.catalogs.set(video_id, catalog)
+        return catalog, transcript_list
+
+    @staticmethod
+    def choose_track(tracks, language=None):
+        """
+        Pick the best caption track: the requested language (manual before generated),
+        then any manually created track, then whatever is available first.
+        """
+        if not tracks:
+            return None
+        if language:
+            for code in (language, language[:2]):
+                for is_generated in (False, True):
+                    for track in tracks:
+                        if track['language_code'] == code and track['is_generated'] == is_generated:
+                            return track
+        for track in tracks:
+            if not track['is_generated']:
+                return track
+        return tracks[0]
+
+    def get(self, video_id, language=None):
+        """
+        Return {'language_code', 'is_generated', 'segments'} for the best track of a
+        video, or None when the video has no usable captions. Segments are the raw
+        timed segments returned by YouTube, as a SegmentStore. Raises VideoUnavailable,
+        also while that outcome is cached, for videos that cannot be watched at all.
+        """
+        transcript_list = None
+        catalog = self.catalogs.get(video_id)
+        if catalog is None:
+            catalog, transcript_list = self._list(video_id)
+        if catalog['status'] == 'unavailable':
+            raise VideoUnavailable(video_id)
+        if catalog['status'] != 'ok':
+            return None
+
+        track = self.choose_track(catalog['tracks'], language)
+        if track is None:
+            return None
+
+        key = f"{video_id}:{track['language_code']}:{int(track['is_generated'])}"
+        cached = self.segments.get(key)
+        if cached is not None:
+            # Entries cached before the columnar format are plain lists of dicts
+            segments = SegmentStore.load(cached)
+        else:
+            if transcript_list is None:
+                catalog, transcript_list = self._list(video_id)
+                if catalog['status'] == 'unavailable':
+                    raise VideoUnavailable(video_id)
+                if transcript_list is None:
+                    return None
+            transcript = self._find(transcript_list, track)
+            if transcript is None:
+                # The catalog was stale; forget it so the next request relists
+                self.catalogs.delete(video_id)
+                return None
+            segments = SegmentStore.from_segments(transcript.fetch())
+            self.segments.set(key, segments.to_columns())
+            print(f"Fetched {'generated' if track['is_generated'] else 'manually created'} transcript in {track['language_code']}")
+
+        return {
+            'language_code': track['language_code'],
+            'is_generated': track['is_generated'],
+            'segments': segments,
+        }
+
+    @staticmethod
+    def _find(transcript_list, track):
+        for transcript in transcript_list:
+            if transcript.language_code == track['language_code'] and transcript.is_generated == track['is_generated']:
+                return transcript
+        return None